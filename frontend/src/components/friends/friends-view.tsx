@@ -45,6 +45,9 @@ export default function FriendsView() {
     sent: FriendRequest[];
     received: FriendRequest[];
   }>({ sent: [], received: [] });
+  const [sentNext, setSentNext] = useState<string | null>(null);
+  const [receivedNext, setReceivedNext] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const { toast } = useToast();
 
@@ -78,7 +81,12 @@ export default function FriendsView() {
         ]);
 
         setFriends(friendsData);
-        setFriendRequests(requestsData);
+        setFriendRequests({
+          sent: requestsData.sent,
+          received: requestsData.received,
+        });
+        setSentNext(requestsData.sent_next);
+        setReceivedNext(requestsData.received_next);
       } catch {
         toast({
           title: 'Error',
@@ -93,6 +101,35 @@ export default function FriendsView() {
     fetchFriendsData();
   }, [toast]);
 
+  const loadMoreRequests = async (direction: 'sent' | 'received') => {
+    const pageUrl = direction === 'sent' ? sentNext : receivedNext;
+    if (!pageUrl) return;
+    setIsLoadingMore(true);
+    try {
+      const friendsApiClient = new FriendsApiClient(
+        authenticationProviderInstance,
+      );
+      const page = await friendsApiClient.getFriendRequests(pageUrl);
+      setFriendRequests((prev) => ({
+        ...prev,
+        [direction]: [...prev[direction], ...page[direction]],
+      }));
+      if (direction === 'sent') {
+        setSentNext(page.sent_next);
+      } else {
+        setReceivedNext(page.received_next);
+      }
+    } catch {
+      toast({
+        title: 'Error',
+        description: 'Failed to load more friend requests.',
+        variant: 'destructive',
+      });
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleSendFriendRequest = async (userId: number) => {
     try {
       const friendsApiClient = new FriendsApiClient(
@@ -395,6 +432,18 @@ export default function FriendsView() {
                             </div>
                           </div>
                         ))}
+                        {receivedNext && (
+                          <div className="flex justify-center">
+                            <Button
+                              variant="outline"
+                              size="sm"
+                              onClick={() => loadMoreRequests('received')}
+                              disabled={isLoadingMore}
+                            >
+                              {isLoadingMore ? 'Loading...' : 'Load more'}
+                            </Button>
+                          </div>
+                        )}
                       </div>
                     ) : (
                       <div className="text-center py-6 border border-dashed rounded-lg">
@@ -455,6 +504,18 @@ export default function FriendsView() {
                             </Button>
                           </div>
                         ))}
+                        {sentNext && (
+                          <div className="flex justify-center">
+                            <Button
+                              variant="outline"
+                              size="sm"
+                              onClick={() => loadMoreRequests('sent')}
+                              disabled={isLoadingMore}
+                            >
+                              {isLoadingMore ? 'Loading...' : 'Load more'}
+                            </Button>
+                          </div>
+                        )}
                       </div>
                     ) : (
                       <div className="text-center py-6 border border-dashed rounded-lg">
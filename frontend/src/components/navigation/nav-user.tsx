@@ -71,7 +71,13 @@ export function NavUser() {
     fetchPrefs();
   }, []);
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    try {
+      const apiClient = new UsersApiClient(authenticationProviderInstance);
+      await apiClient.logoutUser();
+    } catch (error) {
+      // The local session is cleared regardless
+    }
     authenticationProviderInstance.logout();
     navigate('/login');
   };
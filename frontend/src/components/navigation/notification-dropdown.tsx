@@ -57,7 +57,7 @@ export function NotificationDropdown() {
         notificationsApiClient.getNotifications(),
         notificationsApiClient.getUnreadCount(),
       ]);
-      setNotifications(notificationsData);
+      setNotifications(notificationsData.results);
       setUnreadCount(countData.count);
     } finally {
       setIsLoading(false);
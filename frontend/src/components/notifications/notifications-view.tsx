@@ -37,6 +37,8 @@ interface Notification {
 export default function NotificationsView() {
   const [notifications, setNotifications] = React.useState<Notification[]>([]);
   const [isLoading, setIsLoading] = React.useState(true);
+  const [nextPage, setNextPage] = React.useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = React.useState(false);
   const [selectedInvitation, setSelectedInvitation] =
     React.useState<Notification | null>(null);
   const [invitationDialogOpen, setInvitationDialogOpen] = React.useState(false);
@@ -64,14 +66,15 @@ export default function NotificationsView() {
     })();
   }, []);
 
-  const fetchNotifications = async () => {
+  // Loads the newest page, or appends the page at pageUrl when loading more
+  const fetchNotifications = async (pageUrl?: string) => {
     try {
       const notificationsApiClient = new NotificationsApiClient(
         authenticationProviderInstance,
       );
-      const data = await notificationsApiClient.getNotifications();
+      const page = await notificationsApiClient.getNotifications(pageUrl);
       // Apply client-side filtering based on preferences
-      const filtered = data.filter((n: any) => {
+      const filtered = page.results.filter((n: any) => {
         const cfg = prefs?.data?.notifications || ({} as any);
         if (
           n.notification_type === 'friend_accept' &&
@@ -89,7 +92,12 @@ export default function NotificationsView() {
           return false;
         return true;
       });
-      setNotifications(filtered as Notification[]);
+      setNotifications((prev) =>
+        pageUrl
+          ? [...prev, ...(filtered as Notification[])]
+          : (filtered as Notification[]),
+      );
+      setNextPage(page.next);
     } catch (error) {
       toast({
         title: 'Error',
@@ -101,6 +109,16 @@ export default function NotificationsView() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextPage) return;
+    setIsLoadingMore(true);
+    try {
+      await fetchNotifications(nextPage);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const markAsRead = async (notificationId: number) => {
     try {
       const notificationsApiClient = new NotificationsApiClient(
@@ -277,6 +295,18 @@ export default function NotificationsView() {
                   </Card>
                 </motion.div>
               ))}
+              {nextPage && (
+                <div className="flex justify-center pt-2">
+                  <Button
+                    variant="outline"
+                    size="sm"
+                    onClick={loadMore}
+                    disabled={isLoadingMore}
+                  >
+                    {isLoadingMore ? 'Loading...' : 'Load more'}
+                  </Button>
+                </div>
+              )}
             </div>
           </ScrollArea>
         )}
@@ -90,7 +90,13 @@ export default function MainSettings() {
     fetchPreferences();
   }, []);
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    try {
+      const apiClient = new UsersApiClient(authenticationProviderInstance);
+      await apiClient.logoutUser();
+    } catch (error) {
+      // The local session is cleared regardless
+    }
     authenticationProviderInstance.logout();
     navigate('/login');
   };
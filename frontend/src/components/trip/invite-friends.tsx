@@ -127,13 +127,12 @@ export default function InviteFriends({ tripType }: InviteFriendsProps) {
     try {
       const tripsApiClient = new TripsApiClient(authenticationProviderInstance);
 
-      // Send invitations to all selected friends
-      const invitationPromises = selectedFriends.map((friend) =>
-        tripsApiClient.inviteToTrip(tripId, friend.id),
+      // Send invitations to all selected friends in one request
+      await tripsApiClient.inviteManyToTrip(
+        tripId,
+        selectedFriends.map((friend) => friend.id),
       );
 
-      await Promise.all(invitationPromises);
-
       toast({
         title: 'Invitations sent!',
         description: `Successfully sent ${selectedFriends.length} invitation${selectedFriends.length > 1 ? 's' : ''}.`,
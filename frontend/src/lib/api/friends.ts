@@ -18,6 +18,11 @@ export interface FriendRequestsResponse {
   received: FriendRequest[];
 }
 
+export interface FriendRequestsPage extends FriendRequestsResponse {
+  sent_next: string | null;
+  received_next: string | null;
+}
+
 export class FriendsApiClient extends BaseApiClient {
   async getFriends() {
     const response = await fetch(`${FRIENDS_API_URL}/`, {
@@ -32,8 +37,11 @@ export class FriendsApiClient extends BaseApiClient {
     return (await response.json()) as User[];
   }
 
-  async getFriendRequests() {
-    const response = await fetch(`${FRIENDS_API_URL}/requests/`, {
+  // Sent and received requests are paginated independently: following
+  // sent_next advances only the sent list, and received_next only the
+  // received list, so callers read the matching side of the returned page
+  async getFriendRequests(pageUrl?: string) {
+    const response = await fetch(pageUrl ?? `${FRIENDS_API_URL}/requests/`, {
       ...this._requestConfiguration(true),
       method: 'GET',
     });
@@ -42,7 +50,7 @@ export class FriendsApiClient extends BaseApiClient {
       throw new Error(`Error HTTP: ${response.status}`);
     }
 
-    return (await response.json()) as FriendRequestsResponse;
+    return (await response.json()) as FriendRequestsPage;
   }
 
   async sendFriendRequest(receiverId: number) {
@@ -17,12 +17,20 @@ export interface Notification {
   message: string;
   is_read: boolean;
   related_object_id: number | null;
+  count: number;
   created_at: string;
 }
 
+export interface NotificationPage {
+  next: string | null;
+  previous: string | null;
+  results: Notification[];
+}
+
 export class NotificationsApiClient extends BaseApiClient {
-  async getNotifications() {
-    const response = await fetch(`${NOTIFICATION_API_URL}/`, {
+  // Loads one cursor page: the newest notifications, or the page at a previous page's next link
+  async getNotifications(pageUrl?: string) {
+    const response = await fetch(pageUrl ?? `${NOTIFICATION_API_URL}/`, {
       ...this._requestConfiguration(true),
       method: 'GET',
     });
@@ -31,7 +39,7 @@ export class NotificationsApiClient extends BaseApiClient {
       throw new Error(`Error HTTP: ${response.status}`);
     }
 
-    return (await response.json()) as Notification[];
+    return (await response.json()) as NotificationPage;
   }
 
   async getUnreadCount() {
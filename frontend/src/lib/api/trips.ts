@@ -169,6 +169,20 @@ export class TripsApiClient extends BaseApiClient {
     return await response.json();
   }
 
+  async inviteManyToTrip(tripId: number, inviteeIds: number[]) {
+    const response = await fetch(`${TRIP_API_URL}/${tripId}/invite/`, {
+      ...this._requestConfiguration(true),
+      method: 'POST',
+      body: JSON.stringify({ invitee_ids: inviteeIds }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`Error HTTP: ${response.status}`);
+    }
+
+    return await response.json();
+  }
+
   async removeParticipant(tripId: number, participantId: number) {
     const response = await fetch(
       `${TRIP_API_URL}/${tripId}/participants/${participantId}/`,
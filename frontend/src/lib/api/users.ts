@@ -169,6 +169,16 @@ export class UsersApiClient extends BaseApiClient {
     }
   }
 
+  async logoutUser(): Promise<void> {
+    const response = await fetch(`${AUTH_API_URL}/logout/`, {
+      ...this._requestConfiguration(true),
+      method: 'POST',
+    });
+    if (!response.ok) {
+      throw new Error('Failed to log out');
+    }
+  }
+
   async deleteAccount(userId: number): Promise<void> {
     const response = await fetch(`${AUTH_API_URL}/${userId}/`, {
       ...this._requestConfiguration(true),
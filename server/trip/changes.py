@@ -0,0 +1,142 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from user_account.realtime import publish_to_trip
+
+from .models import (
+	Document,
+	DocumentComment,
+	Expense,
+	ExpenseShare,
+	ItineraryEvent,
+	MapSpawnPoint,
+	PackingItem,
+	PackingList,
+	Settlement,
+	Stage,
+	StageElement,
+	StageElementReaction,
+	Trip,
+	TripChange,
+	TripInvitation,
+	TripMapPin,
+	TripMapSettings,
+)
+
+# Resource name and lookup of the owning trip id for every model that belongs to a trip
+TRIP_RESOURCES = {
+	Trip: ("trip", "pk"),
+	TripInvitation: ("invitation", "trip_id"),
+	Stage: ("stage", "trip_id"),
+	StageElement: ("stage_element", "stage__trip_id"),
+	StageElementReaction: ("stage_element_reaction", "stage_element__stage__trip_id"),
+	PackingList: ("packing_list", "trip_id"),
+	PackingItem: ("packing_item", "packing_list__trip_id"),
+	Document: ("document", "trip_id"),
+	DocumentComment: ("document_comment", "document__trip_id"),
+	Expense: ("expense", "trip_id"),
+	ExpenseShare: ("expense_share", "expense__trip_id"),
+	Settlement: ("settlement", "trip_id"),
+	ItineraryEvent: ("itinerary_event", "trip_id"),
+	TripMapPin: ("map_pin", "trip_id"),
+	MapSpawnPoint: ("map_spawn_point", "trip_id"),
+	TripMapSettings: ("map_settings", "trip_id"),
+}
+
+# Models that are synced as part of a parent resource: a write to them is logged as an update of the parent
+SYNC_PARENTS = {
+	TripInvitation: ("trip", "trip_id"),
+	StageElementReaction: ("stage_element", "stage_element_id"),
+	DocumentComment: ("document", "document_id"),
+	ExpenseShare: ("expense", "expense_id"),
+}
+
+
+def resolve_trip_id(instance, lookup):
+	"""
+	Follow a trip id lookup from an instance using foreign key ids: related
+	objects that are already loaded are reused, otherwise only the trip id is
+	selected from the parent's table. None if the parent is already gone.
+	"""
+	name, _, rest = lookup.partition("__")
+	if not rest:
+		return getattr(instance, name)
+	field = instance._meta.get_field(name)
+	if field.is_cached(instance):
+		try:
+			return resolve_trip_id(getattr(instance, name), rest)
+		except ObjectDoesNotExist:
+			return None
+	return field.related_model._default_manager.filter(
+		pk=getattr(instance, field.attname)
+	).values_list(rest, flat=True).first()
+
+
+def get_trip_id(instance):
+	"""Resolve the trip id of a trip-owned instance, or None if its parent is already gone"""
+	return resolve_trip_id(instance, TRIP_RESOURCES[type(instance)][1])
+
+
+def on_trip_change(trip_id, resource, action, object_id):
+	"""Hook for every write to a trip or one of its sub-resources, run after commit"""
+	publish_to_trip(trip_id, "trip.changed", {
+		"trip_id": trip_id,
+		"resource": resource,
+		"action": action,
+		"id": object_id,
+	})
+
+
+def log_changes(trip_id, resource, action, object_ids):
+	"""
+	Append rows to the trip change log read by the delta-sync endpoint and bump
+	the trip's version stamp used for conditional GETs.
+
+	Each row takes the next trip version as its sequence number. The trip row
+	stays locked until the surrounding transaction commits, so a concurrent
+	writer can only number its changes after this one is visible: clients
+	never see a cursor that skips over a change still in flight.
+	"""
+	with transaction.atomic():
+		version = Trip.objects.select_for_update().filter(pk=trip_id).values_list("version", flat=True).first()
+		if version is None:
+			# The trip itself is gone, members can no longer sync it
+			return
+		Trip.objects.filter(pk=trip_id).update(
+			version=F("version") + len(object_ids), modified_at=timezone.now()
+		)
+		TripChange.objects.bulk_create([
+			TripChange(trip_id=trip_id, seq=version + offset, resource=resource, object_id=object_id, action=action)
+			for offset, object_id in enumerate(object_ids, start=1)
+		])
+
+
+def record_changes(trip_id, resource, action, object_ids):
+	"""
+	Log writes to a trip resource for delta sync and push them to the trip's
+	websocket group once the transaction commits. Use this directly for
+	queryset update()/bulk_create(), which do not send model signals.
+	"""
+	object_ids = list(object_ids)
+	if not object_ids:
+		return
+	log_changes(trip_id, resource, action, object_ids)
+	transaction.on_commit(lambda: [
+		on_trip_change(trip_id, resource, action, object_id) for object_id in object_ids
+	])
+
+
+def record_change(instance, action):
+	trip_id = get_trip_id(instance)
+	if trip_id is None:
+		return
+	model = type(instance)
+	if model not in SYNC_PARENTS:
+		record_changes(trip_id, TRIP_RESOURCES[model][0], action, [instance.pk])
+		return
+	parent_resource, parent_attr = SYNC_PARENTS[model]
+	log_changes(trip_id, parent_resource, "updated", [getattr(instance, parent_attr)])
+	resource, object_id = TRIP_RESOURCES[model][0], instance.pk
+	transaction.on_commit(lambda: on_trip_change(trip_id, resource, action, object_id))
@@ -0,0 +1,40 @@
+from django.db.models import Q
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .models import Trip
+
+
+def get_trip_version(request, pk=None, trip_id=None, **kwargs):
+	"""
+	(version, modified_at) of the requested trip if the user is a member, looked
+	up once per request. The trip comes from the URL or, for the stage list, the
+	trip_id query parameter.
+	"""
+	trip_pk = pk or trip_id or request.query_params.get("trip_id")
+	if not trip_pk:
+		return None
+	cache = request.__dict__.setdefault("_trip_versions", {})
+	if trip_pk not in cache:
+		cache[trip_pk] = Trip.objects.filter(
+			Q(pk=trip_pk) & (Q(owner=request.user) | Q(participants=request.user))
+		).values_list("version", "modified_at").first()
+	return cache[trip_pk]
+
+
+def trip_etag(request, *args, **kwargs):
+	stamp = get_trip_version(request, *args, **kwargs)
+	if stamp is None:
+		return None
+	# Bodies can differ per user (private documents, own reactions), so the user is part of the tag
+	trip_pk = kwargs.get("pk") or kwargs.get("trip_id") or request.query_params.get("trip_id")
+	return f'W/"{trip_pk}-{stamp[0]}-{request.user.pk}"'
+
+
+def trip_last_modified(request, *args, **kwargs):
+	stamp = get_trip_version(request, *args, **kwargs)
+	return stamp[1] if stamp else None
+
+
+# Apply to the get() of any view whose response only depends on the trip's rows
+trip_condition = method_decorator(condition(etag_func=trip_etag, last_modified_func=trip_last_modified))
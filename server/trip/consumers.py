@@ -0,0 +1,36 @@
+from channels.db import database_sync_to_async
+from django.db.models import Q
+
+from user_account.consumers import PushConsumer
+from user_account.realtime import trip_group
+
+from .models import Trip
+
+
+class TripConsumer(PushConsumer):
+	"""Per-trip channel for changes to the trip and its sub-resources"""
+
+	@database_sync_to_async
+	def is_member(self, trip_id):
+		user = self.scope["user"]
+		return Trip.objects.filter(
+			Q(pk=trip_id) & (Q(owner=user) | Q(participants=user))
+		).exists()
+
+	async def get_groups(self):
+		trip_id = self.scope["url_route"]["kwargs"]["pk"]
+		if not await self.is_member(trip_id):
+			return None
+		return [trip_group(trip_id)]
+
+	async def membership_changed(self, message):
+		"""Stop streaming the trip to a user who is no longer a member"""
+		user_ids = message["user_ids"]
+		if user_ids is not None and self.scope["user"].id not in user_ids:
+			return
+		trip_id = self.scope["url_route"]["kwargs"]["pk"]
+		if await self.is_member(trip_id):
+			return
+		await self.channel_layer.group_discard(trip_group(trip_id), self.channel_name)
+		self.push_groups = []
+		await self.close(code=4003)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from trip.response_cache import get_response_cache_metrics, reset_response_cache_metrics
+
+
+class Command(BaseCommand):
+    help = 'Show hit and miss counts of the trip response cache per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        metrics = get_response_cache_metrics()
+        if not metrics:
+            self.stdout.write('No response cache traffic recorded')
+        for endpoint, counts in sorted(metrics.items()):
+            total = counts['hit'] + counts['miss']
+            self.stdout.write(
+                f"{endpoint}: {counts['hit']} hits, {counts['miss']} misses, "
+                f"{counts['hit'] / total:.1%} hit rate"
+            )
+        if options['reset']:
+            reset_response_cache_metrics()
+            self.stdout.write(self.style.SUCCESS('Response cache counters reset'))
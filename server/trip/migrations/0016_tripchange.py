@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trip", "0015_tripmappin_itinerary_event_mapspawnpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TripChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("trip_id", models.BigIntegerField()),
+                ("seq", models.PositiveBigIntegerField()),
+                ("resource", models.CharField(max_length=50)),
+                ("object_id", models.BigIntegerField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("updated", "Updated"),
+                            ("deleted", "Deleted"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("changed_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["trip_id", "seq"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("trip_id", "seq"), name="tripchange_trip_seq_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trip", "0016_tripchange"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="modified_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="trip",
+            name="version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
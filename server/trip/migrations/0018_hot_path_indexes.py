@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trip", "0017_trip_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(
+                fields=["trip", "visibility", "-created_at"],
+                name="document_trip_visibility_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="itineraryevent",
+            index=models.Index(
+                fields=["trip", "date", "start_minutes"], name="itinerary_trip_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stageelementreaction",
+            index=models.Index(
+                fields=["stage_element", "user"], name="reaction_element_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tripinvitation",
+            index=models.Index(
+                fields=["status", "expires_at"], name="tripinv_status_expires_idx"
+            ),
+        ),
+    ]
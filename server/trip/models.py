@@ -1,13 +1,29 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
 from django.utils import timezone
 from datetime import timedelta
 
 User = get_user_model()
 
 
-class Trip(models.Model):
+class ChangeLoggedModel(models.Model):
+    """
+    Trip data whose writes are recorded by trip.signals. Saves run in a
+    transaction so the row, its change log entry and the trip version bump
+    commit together; deletes already send their signals inside one.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, using=None, **kwargs):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, using=using, **kwargs)
+
+
+class Trip(ChangeLoggedModel):
     TRIP_TYPE_CHOICES = [
         ("private", "Private"),
         ("public", "Public"),
@@ -38,6 +54,10 @@ class Trip(models.Model):
     invite_permission = models.CharField(
         max_length=50, choices=INVITE_PERMISSION_CHOICES, default="admin-only"
     )
+    # Bumped on every write to the trip or its sub-resources, used for conditional GETs and
+    # as the delta-sync cursor (see TripChange.seq)
+    version = models.PositiveBigIntegerField(default=0)
+    modified_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return self.name
@@ -46,7 +66,7 @@ class Trip(models.Model):
         ordering = ["-created_at"]
 
 
-class TripInvitation(models.Model):
+class TripInvitation(ChangeLoggedModel):
     STATUS_CHOICES = [
         ("pending", "Pending"),
         ("accepted", "Accepted"),
@@ -69,6 +89,9 @@ class TripInvitation(models.Model):
     class Meta:
         unique_together = ["trip", "invitee"]
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="tripinv_status_expires_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.expires_at and self.status == 'pending':
@@ -82,7 +105,7 @@ class TripInvitation(models.Model):
         return f"{self.inviter.username} invited {self.invitee.username} to {self.trip.name}"
 
 
-class Stage(models.Model):
+class Stage(ChangeLoggedModel):
     name = models.CharField(max_length=255)
     category = models.CharField(max_length=50)
     description = models.TextField(blank=True, null=True)
@@ -103,7 +126,7 @@ class Stage(models.Model):
         ordering = ["trip", "order"]
 
 
-class StageElement(models.Model):
+class StageElement(ChangeLoggedModel):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     url = models.URLField(blank=True, null=True)
@@ -128,14 +151,19 @@ class StageElement(models.Model):
         ordering = ["-created_at"]
 
 
-class StageElementReaction(models.Model):
+class StageElementReaction(ChangeLoggedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     stage_element = models.ForeignKey(StageElement, on_delete=models.CASCADE)
     reaction = models.IntegerField(choices=[(i, str(i)) for i in range(1, 6)])
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["stage_element", "user"], name="reaction_element_user_idx"),
+        ]
+
 
-class PackingList(models.Model):
+class PackingList(ChangeLoggedModel):
     LIST_TYPE_CHOICES = [
         ("private", "Private"),
         ("shared", "Shared"),
@@ -157,7 +185,7 @@ class PackingList(models.Model):
         unique_together = ("trip", "name", "list_type")
 
 
-class PackingItem(models.Model):
+class PackingItem(ChangeLoggedModel):
     PRIORITY_CHOICES = [
         ("low", "Low"),
         ("medium", "Medium"),
@@ -202,7 +230,7 @@ class DocumentCategory(models.Model):
         verbose_name_plural = "Document categories"
 
 
-class Document(models.Model):
+class Document(ChangeLoggedModel):
     """Trip documents that can be shared or private"""
     DOCUMENT_TYPE_CHOICES = [
         ("pdf", "PDF"),
@@ -241,6 +269,9 @@ class Document(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["trip", "visibility", "-created_at"], name="document_trip_visibility_idx"),
+        ]
 
     @property
     def is_image(self):
@@ -255,7 +286,7 @@ class Document(models.Model):
         return self.file_type in ["text", "markdown"]
 
 
-class DocumentComment(models.Model):
+class DocumentComment(ChangeLoggedModel):
     """Comments and notes on documents"""
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="comments")
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="document_comments")
@@ -270,7 +301,7 @@ class DocumentComment(models.Model):
         ordering = ["created_at"]
 
 
-class Expense(models.Model):
+class Expense(ChangeLoggedModel):
     SPLIT_METHOD_CHOICES = [
         ("equal", "Equal"),
         ("percentage", "Percentage"),
@@ -296,7 +327,7 @@ class Expense(models.Model):
         ordering = ["-created_at"]
 
 
-class ExpenseShare(models.Model):
+class ExpenseShare(ChangeLoggedModel):
     expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name="shares")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="expense_shares")
     percentage = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
@@ -310,7 +341,7 @@ class ExpenseShare(models.Model):
         return f"{self.user.username} owes {self.owed_amount} for {self.expense.description}"
 
 
-class Settlement(models.Model):
+class Settlement(ChangeLoggedModel):
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="settlements")
     payer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="made_settlements")
     payee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="received_settlements")
@@ -323,7 +354,7 @@ class Settlement(models.Model):
         return f"{self.payer.username} -> {self.payee.username}: {self.amount} {self.currency} ({self.trip.name})"
 
 
-class ItineraryEvent(models.Model):
+class ItineraryEvent(ChangeLoggedModel):
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="itinerary_events")
     date = models.DateField()
     title = models.CharField(max_length=255)
@@ -337,12 +368,15 @@ class ItineraryEvent(models.Model):
 
     class Meta:
         ordering = ["date", "start_minutes"]
+        indexes = [
+            models.Index(fields=["trip", "date", "start_minutes"], name="itinerary_trip_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.date}) - {self.trip.name}"
 
 
-class TripMapPin(models.Model):
+class TripMapPin(ChangeLoggedModel):
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="map_pins")
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="created_trip_pins")
     title = models.CharField(max_length=255)
@@ -368,7 +402,7 @@ class TripMapPin(models.Model):
         return f"{self.title} ({self.latitude}, {self.longitude}) - {self.trip.name}"
 
 
-class MapSpawnPoint(models.Model):
+class MapSpawnPoint(ChangeLoggedModel):
     """Starting points/locations for the map - more user-friendly than 'default center'"""
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="map_spawn_points")
     name = models.CharField(max_length=255, help_text="Friendly name for this location (e.g., 'Hotel', 'Airport', 'Downtown')")
@@ -386,7 +420,7 @@ class MapSpawnPoint(models.Model):
         return f"{self.name} ({self.latitude}, {self.longitude}) - {self.trip.name}"
 
 
-class TripMapSettings(models.Model):
+class TripMapSettings(ChangeLoggedModel):
     trip = models.OneToOneField(Trip, on_delete=models.CASCADE, related_name="map_settings")
     # Keep these for backward compatibility, but prefer using MapSpawnPoint
     default_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
@@ -396,4 +430,32 @@ class TripMapSettings(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"MapSettings for {self.trip.name}"
\ No newline at end of file
+        return f"MapSettings for {self.trip.name}"
+
+
+class TripChange(models.Model):
+    """Append-only log of writes to a trip and its sub-resources, read by the delta-sync endpoint"""
+    ACTION_CHOICES = [
+        ("created", "Created"),
+        ("updated", "Updated"),
+        ("deleted", "Deleted"),
+    ]
+
+    # Plain id rather than a foreign key: deleting a trip leaves its log rows to prune_trip_changes instead of
+    # cascading into this append-only table. Deletes of the trip itself are not logged.
+    trip_id = models.BigIntegerField()
+    # Per-trip sync cursor: the trip's version after this change, assigned under the trip row lock
+    seq = models.PositiveBigIntegerField()
+    resource = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["trip_id", "seq"]
+        constraints = [
+            models.UniqueConstraint(fields=["trip_id", "seq"], name="tripchange_trip_seq_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} {self.action} (trip {self.trip_id})"
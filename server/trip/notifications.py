@@ -0,0 +1,16 @@
+from django.db import transaction
+
+from user_account.notifications import serialize_event
+from .tasks import fan_out_trip_notifications
+
+
+def notify_trip_members(trip, event, exclude=None):
+	"""
+	Queue ``event`` (see user_account.notifications.notify_users) for every
+	trip participant, skipping the users or user ids in ``exclude``. Member
+	lookup, preference filtering and inserts happen in Celery after commit.
+	"""
+	trip_id = trip.pk
+	exclude_ids = [getattr(user, "pk", user) for user in exclude or []]
+	payload = {"trip_id": trip_id, **serialize_event(event)}
+	transaction.on_commit(lambda: fan_out_trip_notifications.delay(trip_id, payload, exclude_ids))
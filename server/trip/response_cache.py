@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.decorators import method_decorator
+from redis.exceptions import RedisError
+from rest_framework import status
+from rest_framework.response import Response
+
+from user_account.redis_utils import get_redis_connection
+
+from .conditional import get_trip_version
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_KEY = "trip:{trip_id}:response:{endpoint}:v{version}:{visibility}:{query}"
+RESPONSE_CACHE_METRICS_KEY = "trip:response_cache:metrics"
+
+
+def member_visibility(request):
+	"""Every member of the trip sees the same body"""
+	return "member"
+
+
+def response_cache_key(request, endpoint, trip_id, version, visibility):
+	query = hashlib.md5(request.META.get("QUERY_STRING", "").encode()).hexdigest()[:12]
+	return RESPONSE_CACHE_KEY.format(
+		trip_id=trip_id, endpoint=endpoint, version=version, visibility=visibility, query=query,
+	)
+
+
+def record_cache_result(r, endpoint, result):
+	try:
+		r.hincrby(RESPONSE_CACHE_METRICS_KEY, f"{endpoint}:{result}", 1)
+	except RedisError:
+		logger.warning("Failed to record response cache %s for %s", result, endpoint)
+
+
+def get_response_cache_metrics():
+	"""{endpoint: {"hit": n, "miss": n}} since the counters were last reset"""
+	metrics = {}
+	for field, value in get_redis_connection().hgetall(RESPONSE_CACHE_METRICS_KEY).items():
+		endpoint, result = field.rsplit(":", 1)
+		metrics.setdefault(endpoint, {"hit": 0, "miss": 0})[result] = int(value)
+	return metrics
+
+
+def reset_response_cache_metrics():
+	get_redis_connection().delete(RESPONSE_CACHE_METRICS_KEY)
+
+
+def cache_trip_response(endpoint, visibility=member_visibility):
+	"""
+	Cache the 200 body of a trip-scoped GET in Redis, keyed by endpoint, trip,
+	trip version and the user's visibility class. Writes bump the trip version,
+	so stale entries are never read again and simply expire after
+	TRIP_RESPONSE_CACHE_TTL. Endpoints listed in TRIP_RESPONSE_CACHE_DISABLED
+	always hit the view.
+	"""
+	def decorator(view):
+		@wraps(view)
+		def wrapper(request, *args, **kwargs):
+			if endpoint in settings.TRIP_RESPONSE_CACHE_DISABLED:
+				return view(request, *args, **kwargs)
+			stamp = get_trip_version(request, *args, **kwargs)
+			if stamp is None:
+				return view(request, *args, **kwargs)
+
+			trip_id = kwargs.get("pk") or kwargs.get("trip_id") or request.query_params.get("trip_id")
+			key = response_cache_key(request, endpoint, trip_id, stamp[0], visibility(request))
+			r = get_redis_connection()
+			try:
+				cached = r.get(key)
+			except RedisError:
+				logger.warning("Response cache unavailable for %s", endpoint)
+				return view(request, *args, **kwargs)
+
+			if cached is not None:
+				record_cache_result(r, endpoint, "hit")
+				return Response(json.loads(cached), status=status.HTTP_200_OK)
+
+			record_cache_result(r, endpoint, "miss")
+			response = view(request, *args, **kwargs)
+			if response.status_code == status.HTTP_200_OK:
+				try:
+					r.set(key, json.dumps(response.data, cls=DjangoJSONEncoder), ex=settings.TRIP_RESPONSE_CACHE_TTL)
+				except RedisError:
+					logger.warning("Failed to store cached response for %s", endpoint)
+			return response
+		return wrapper
+	return method_decorator(decorator)
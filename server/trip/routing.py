@@ -0,0 +1,7 @@
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+	path("ws/trips/<int:pk>/", consumers.TripConsumer.as_asgi(), name="ws-trip"),
+]
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
 from .models import Trip, Stage, StageElement, TripInvitation, PackingList, PackingItem, DocumentCategory, Document, DocumentComment, Expense, ExpenseShare, Settlement, ItineraryEvent, TripMapPin, TripMapSettings, MapSpawnPoint
@@ -146,6 +147,7 @@ class TripSerializer(serializers.ModelSerializer):
 		return TripParticipantSerializer(unique_users, many=True,
 										  context={'request': self.context.get('request'), 'trip': obj}).data
 
+	@transaction.atomic
 	def create(self, validated_data):
 		validated_data["owner"] = self.context["request"].user
 		trip = super().create(validated_data)
@@ -209,6 +211,7 @@ class PackingItemSerializer(serializers.ModelSerializer):
 		model = PackingItem
 		fields = [
 			"id",
+			"packing_list",
 			"name",
 			"description",
 			"category",
@@ -222,7 +225,7 @@ class PackingItemSerializer(serializers.ModelSerializer):
 			"created_at",
 			"updated_at",
 		]
-		read_only_fields = ["id", "created_by", "packed_by", "packed_at", "created_at", "updated_at"]
+		read_only_fields = ["id", "packing_list", "created_by", "packed_by", "packed_at", "created_at", "updated_at"]
 
 
 class PackingListSerializer(serializers.ModelSerializer):
@@ -531,6 +534,7 @@ class ExpenseSerializer(serializers.ModelSerializer):
             return round(float(amount) * (user_shares / total_shares), 2)
         return 0.0
 
+    @transaction.atomic
     def create(self, validated_data):
         trip = self.context.get("trip")
         shares_data = validated_data.pop("shares", [])
@@ -557,6 +561,7 @@ class ExpenseSerializer(serializers.ModelSerializer):
 
         return expense
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         shares_data = validated_data.pop("shares", None)
         paid_by_id = validated_data.pop("paid_by_id", None)
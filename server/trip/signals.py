@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from user_account.realtime import revoke_trip_access
+from user_account.suggestions import trips_changed
+
+from .changes import TRIP_RESOURCES, log_changes, on_trip_change, record_change, record_changes
+from .models import Trip
+
+User = get_user_model()
+
+# Profile fields embedded in trip payloads (UserBasicSerializer, TripParticipantSerializer)
+EMBEDDED_PROFILE_FIELDS = {"username", "first_name", "last_name", "email", "avatar"}
+
+
+def trip_resource_saved(sender, instance, created, raw=False, **kwargs):
+	if not raw:
+		record_change(instance, "created" if created else "updated")
+
+
+def trip_resource_deleted(sender, instance, **kwargs):
+	record_change(instance, "deleted")
+
+
+# Connected per model: a sender-less post_delete receiver would disable fast deletes for every model
+for model in TRIP_RESOURCES:
+	post_save.connect(trip_resource_saved, sender=model, dispatch_uid=f"trip_resource_saved.{model.__name__}")
+	post_delete.connect(trip_resource_deleted, sender=model, dispatch_uid=f"trip_resource_deleted.{model.__name__}")
+
+
+@receiver(m2m_changed, sender=Trip.participants.through)
+def trip_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	if action not in ("post_add", "post_remove", "post_clear"):
+		return
+	if reverse:
+		trip_ids, user_ids = list(pk_set or []), [instance.pk]
+	else:
+		trip_ids, user_ids = [instance.pk], list(pk_set or [])
+	for trip_id in trip_ids:
+		log_changes(trip_id, "trip", "updated", [trip_id])
+		transaction.on_commit(lambda trip_id=trip_id: on_trip_change(trip_id, "participants", "updated", trip_id))
+	if action != "post_add":
+		# Removed members lose their live subscription; a clear re-checks every socket
+		removed_ids = None if action == "post_clear" else user_ids
+		for trip_id in trip_ids:
+			transaction.on_commit(lambda trip_id=trip_id: revoke_trip_access(trip_id, removed_ids))
+	# Co-travellers feed friend suggestions
+	transaction.on_commit(lambda: trips_changed(trip_ids, user_ids))
+
+
+@receiver(post_save, sender=User)
+def member_profile_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+	"""
+	Trip payloads embed the owner's, participants' and invitees' profiles, so a
+	profile edit is an update of each of their trips: it bumps their versions
+	(ETags) and re-sends the trip resource to syncing clients.
+	"""
+	if created or raw or (update_fields is not None and not EMBEDDED_PROFILE_FIELDS & set(update_fields)):
+		return
+	trip_ids = Trip.objects.filter(
+		Q(owner=instance) | Q(participants=instance)
+		| Q(invitations__invitee=instance, invitations__status="pending")
+	).values_list("pk", flat=True).distinct()
+	# Lock trip rows in a fixed order so concurrent profile edits cannot deadlock
+	with transaction.atomic():
+		for trip_id in sorted(trip_ids):
+			record_changes(trip_id, "trip", "updated", [trip_id])
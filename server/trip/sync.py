@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.db.models import Avg, Case, Count, F, IntegerField, Prefetch, Q, When
+
+from .models import (
+	Document,
+	Expense,
+	ItineraryEvent,
+	MapSpawnPoint,
+	PackingItem,
+	PackingList,
+	Settlement,
+	Stage,
+	StageElement,
+	StageElementReaction,
+	Trip,
+	TripChange,
+	TripMapPin,
+	TripMapSettings,
+)
+from .serializers import (
+	DocumentSerializer,
+	ExpenseSerializer,
+	ItineraryEventSerializer,
+	MapSpawnPointSerializer,
+	PackingItemSerializer,
+	PackingListSerializer,
+	SettlementSerializer,
+	StageSerializer,
+	TripMapPinSerializer,
+	TripMapSettingsSerializer,
+	TripSerializer,
+)
+
+
+def trip_queryset(trip, request):
+	return Trip.objects.filter(pk=trip.pk)
+
+
+def stage_queryset(trip, request):
+	return Stage.objects.filter(trip=trip)
+
+
+def stage_element_queryset(trip, request):
+	return StageElement.objects.filter(stage__trip=trip).annotate(
+		average_reaction=Avg("stageelementreaction__reaction"),
+	).prefetch_related(
+		Prefetch("stageelementreaction_set", queryset=StageElementReaction.objects.select_related("user")),
+	)
+
+
+def packing_list_queryset(trip, request):
+	return PackingList.objects.filter(trip=trip).select_related("created_by").annotate(
+		total_items=Count("items"),
+		packed_items=Count(Case(When(items__is_packed=True, then=1), output_field=IntegerField())),
+		completion_percentage=Case(
+			When(total_items__gt=0, then=(F("packed_items") * 100.0) / F("total_items")),
+			default=0.0,
+			output_field=IntegerField(),
+		),
+	)
+
+
+def packing_item_queryset(trip, request):
+	return PackingItem.objects.filter(packing_list__trip=trip).select_related("assigned_to", "created_by", "packed_by")
+
+
+def document_queryset(trip, request):
+	# Same default visibility as the document list: shared documents plus the user's own
+	return Document.objects.filter(
+		Q(visibility="shared") | Q(uploaded_by=request.user), trip=trip
+	).select_related("category", "uploaded_by").prefetch_related("comments__author")
+
+
+def expense_queryset(trip, request):
+	return Expense.objects.filter(trip=trip).select_related("paid_by").prefetch_related("shares__user")
+
+
+def settlement_queryset(trip, request):
+	return Settlement.objects.filter(trip=trip).select_related("payer", "payee")
+
+
+def itinerary_event_queryset(trip, request):
+	return ItineraryEvent.objects.filter(trip=trip)
+
+
+def map_pin_queryset(trip, request):
+	return TripMapPin.objects.filter(trip=trip).select_related("created_by")
+
+
+def map_spawn_point_queryset(trip, request):
+	return MapSpawnPoint.objects.filter(trip=trip)
+
+
+def map_settings_queryset(trip, request):
+	return TripMapSettings.objects.filter(trip=trip)
+
+
+def serialize_stage_elements(elements, request):
+	"""Same shape as the stage element list, plus the stage id so clients can place the element"""
+	data = []
+	for element in elements:
+		reactions = list(element.stageelementreaction_set.all())
+		user_reaction = next((r.reaction for r in reactions if r.user_id == request.user.id), None)
+		data.append({
+			"id": element.id,
+			"stage": element.stage_id,
+			"name": element.name,
+			"description": element.description,
+			"url": element.url,
+			"averageReaction": element.average_reaction,
+			"userReaction": user_reaction,
+			"reactions": [
+				{"userId": r.user.id, "userName": r.user.username, "reaction": r.reaction}
+				for r in reactions
+			],
+		})
+	return data
+
+
+def serializer_for(serializer_class):
+	def serialize(objects, request):
+		return serializer_class(objects, many=True, context={"request": request}).data
+	return serialize
+
+
+# Resource name (as logged in TripChange) -> (visible queryset for a member, serializer)
+SYNC_RESOURCES = {
+	"trip": (trip_queryset, serializer_for(TripSerializer)),
+	"stage": (stage_queryset, serializer_for(StageSerializer)),
+	"stage_element": (stage_element_queryset, serialize_stage_elements),
+	"packing_list": (packing_list_queryset, serializer_for(PackingListSerializer)),
+	"packing_item": (packing_item_queryset, serializer_for(PackingItemSerializer)),
+	"document": (document_queryset, serializer_for(DocumentSerializer)),
+	"expense": (expense_queryset, serializer_for(ExpenseSerializer)),
+	"settlement": (settlement_queryset, serializer_for(SettlementSerializer)),
+	"itinerary_event": (itinerary_event_queryset, serializer_for(ItineraryEventSerializer)),
+	"map_pin": (map_pin_queryset, serializer_for(TripMapPinSerializer)),
+	"map_spawn_point": (map_spawn_point_queryset, serializer_for(MapSpawnPointSerializer)),
+	"map_settings": (map_settings_queryset, serializer_for(TripMapSettingsSerializer)),
+}
+
+
+def build_snapshot(trip, request):
+	"""Full state of a trip for clients without a usable cursor"""
+	# The version was read before any resource, so changes made while serializing are delivered again later
+	changes = {}
+	for resource, (get_queryset, serialize) in SYNC_RESOURCES.items():
+		changes[resource] = {"upserts": serialize(get_queryset(trip, request), request), "deletes": []}
+	return {"cursor": trip.version, "full": True, "has_more": False, "changes": changes}
+
+
+def build_delta(trip, request, since):
+	"""
+	Everything that changed in a trip after the `since` cursor, or None if the
+	cursor is not one this trip handed out or is older than the retained change
+	log, and the client must resync.
+	"""
+	# Cursors are the trip's own change sequence numbers (its version)
+	if since > trip.version:
+		return None
+	log = TripChange.objects.filter(trip_id=trip.pk)
+	# Pruning removes the oldest rows, so anything before the oldest retained row may be gone
+	oldest = log.order_by("seq").values_list("seq", flat=True).first()
+	if since < (oldest if oldest is not None else trip.version + 1) - 1:
+		return None
+
+	limit = settings.SYNC_MAX_CHANGES
+	rows = list(
+		log.filter(seq__gt=since, seq__lte=trip.version).order_by("seq")
+		.values_list("seq", "resource", "object_id", "action")[:limit + 1]
+	)
+	has_more = len(rows) > limit
+	rows = rows[:limit]
+
+	# Only the latest action per object matters to the client
+	latest = {}
+	for _, resource, object_id, action in rows:
+		latest[(resource, object_id)] = action
+
+	changes = {}
+	for (resource, object_id), action in latest.items():
+		entry = changes.setdefault(resource, {"upserts": set(), "deletes": set()})
+		entry["deletes" if action == "deleted" else "upserts"].add(object_id)
+
+	for resource, entry in changes.items():
+		ids = entry.pop("upserts")
+		deletes = entry.pop("deletes")
+		upserts = []
+		if resource in SYNC_RESOURCES and ids:
+			get_queryset, serialize = SYNC_RESOURCES[resource]
+			objects = list(get_queryset(trip, request).filter(pk__in=ids))
+			upserts = serialize(objects, request)
+			# Objects that are gone or no longer visible to this user are deletes for the client
+			deletes |= ids - {obj.pk for obj in objects}
+		entry["upserts"] = upserts
+		entry["deletes"] = sorted(deletes)
+
+	cursor = rows[-1][0] if rows else since
+	return {"cursor": cursor, "full": False, "has_more": has_more, "changes": changes}
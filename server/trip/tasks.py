@@ -1,10 +1,11 @@
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 from .models import TripInvitation
-from user_account.models import Notification
+from user_account.notifications import create_notifications
 from datetime import timedelta
 
-from .models import Document
+from .models import Document, Trip, TripChange
 
 
 @shared_task
@@ -69,22 +70,53 @@ def send_invitation_reminder():
         status='pending',
         expires_at__gte=tomorrow,
         expires_at__lt=expiring_soon
-    )
+    ).select_related('trip')
 
     notification_count = 0
 
     for invitation in expiring_invitations:
         try:
-            Notification.objects.create(
-                recipient=invitation.invitee,
-                sender=invitation.inviter,
-                notification_type='trip_invite_reminder',
-                title='Trip Invitation Reminder',
-                message=f'Reminder: Your invitation to join "{invitation.trip.name}" is expiring soon.',
-                related_object_id=invitation.id
-            )
-            notification_count += 1
+            notification_count += len(create_notifications([invitation.invitee_id], {
+                'sender_id': invitation.inviter_id,
+                'notification_type': 'trip_invite_reminder',
+                'title': 'Trip Invitation Reminder',
+                'message': f'Reminder: Your invitation to join "{invitation.trip.name}" is expiring soon.',
+                'related_object_id': invitation.id,
+                'trip_id': invitation.trip_id,
+            }))
         except Exception as e:
             print(f"Failed to send reminder for invitation {invitation.id}: {e}")
 
-    return f"created {notification_count} notifications"
\ No newline at end of file
+    return f"created {notification_count} notifications"
+
+
+@shared_task
+def fan_out_trip_notifications(trip_id, event, exclude_ids):
+    """
+    Notify all participants of a trip, except ``exclude_ids``, about ``event``
+    """
+    member_ids = Trip.participants.through.objects.filter(
+        trip_id=trip_id
+    ).exclude(profile_id__in=exclude_ids).values_list('profile_id', flat=True)
+
+    return len(create_notifications(member_ids, event))
+
+
+@shared_task
+def prune_trip_changes(batch_size=5000):
+    """
+    Delete trip change log rows older than SYNC_CHANGE_RETENTION_DAYS. Cursors
+    from before the oldest retained row of a trip are answered with a resync.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_CHANGE_RETENTION_DAYS)
+    deleted_count = 0
+    while True:
+        ids = list(
+            TripChange.objects.filter(changed_at__lt=cutoff)
+            .order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        deleted_count += TripChange.objects.filter(id__in=ids).delete()[0]
+
+    return deleted_count
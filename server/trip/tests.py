@@ -1,2 +1,318 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models.deletion import Collector
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from user_account.models import Notification, OutboundEmail, Profile
+from tripwhizz.test_runner import clear_redis
+from user_account.redis_utils import get_unread_count
+
+from .changes import get_trip_id
+from .consumers import TripConsumer
+from .models import Document, Stage, StageElement, Trip, TripChange, TripInvitation
+from .sync import build_delta
+from .tasks import send_invitation_reminder
+
+
+def create_trip(owner, **kwargs):
+    trip = Trip.objects.create(name="Trip", destination="Lisbon", owner=owner, **kwargs)
+    trip.participants.add(owner)
+    return trip
+
+
+class TripChangeSignalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Profile.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        cls.trip = create_trip(cls.owner)
+        cls.stage = Stage.objects.create(name="Day 1", category="sightseeing", trip=cls.trip)
+
+    def test_models_outside_the_trip_keep_fast_deletes(self):
+        collector = Collector(using="default")
+        self.assertTrue(collector.can_fast_delete(TripChange.objects.all()))
+        self.assertTrue(collector.can_fast_delete(Notification.objects.all()))
+
+    def test_trip_id_is_resolved_from_foreign_key_ids(self):
+        element = StageElement.objects.create(name="Museum", stage=self.stage)
+        element = StageElement.objects.get(pk=element.pk)
+        # Only the parent's trip id is selected, the stage itself is never loaded
+        with self.assertNumQueries(1):
+            self.assertEqual(get_trip_id(element), self.trip.pk)
+        self.assertFalse(StageElement._meta.get_field("stage").is_cached(element))
+
+    def test_trip_id_reuses_loaded_parents(self):
+        element = StageElement(name="Museum", stage=self.stage)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_trip_id(element), self.trip.pk)
+
+    def test_child_writes_are_logged_against_the_trip(self):
+        element = StageElement.objects.create(name="Museum", stage=self.stage)
+        element_id = element.pk
+        element.delete()
+        self.assertEqual(
+            list(TripChange.objects.filter(resource="stage_element").values_list("trip_id", "object_id", "action")),
+            [(self.trip.pk, element_id, "created"), (self.trip.pk, element_id, "deleted")],
+        )
+
+
+class TripVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Profile.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        cls.trip = create_trip(cls.owner)
+
+    def version(self):
+        return Trip.objects.get(pk=self.trip.pk).version
+
+    def test_write_rolls_back_with_its_change_log_entry(self):
+        version = self.version()
+        with mock.patch.object(TripChange.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                Stage.objects.create(name="Day 1", category="sightseeing", trip=self.trip)
+        self.assertFalse(Stage.objects.filter(name="Day 1").exists())
+        self.assertEqual(self.version(), version)
+
+    def test_member_profile_edit_bumps_the_trip_version(self):
+        version = self.version()
+        self.owner.first_name = "Ada"
+        self.owner.save()
+        self.assertGreater(self.version(), version)
+
+    def test_last_login_update_keeps_the_trip_version(self):
+        version = self.version()
+        self.owner.save(update_fields=["last_login"])
+        self.assertEqual(self.version(), version)
+
+
+def sync_request(user):
+    request = APIRequestFactory().get("/")
+    request.user = user
+    return request
+
+
+def delta_stage_names(delta):
+    return sorted(stage["name"] for stage in delta["changes"].get("stage", {}).get("upserts", []))
+
+
+class TripSyncCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Profile.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        cls.trip = create_trip(cls.owner)
+
+    def delta(self, since):
+        return build_delta(Trip.objects.get(pk=self.trip.pk), sync_request(self.owner), since)
+
+    def test_changes_are_numbered_per_trip(self):
+        cursor = Trip.objects.get(pk=self.trip.pk).version
+        Stage.objects.create(name="Day 1", category="sightseeing", trip=self.trip)
+        Stage.objects.create(name="Day 2", category="sightseeing", trip=self.trip)
+        delta = self.delta(cursor)
+        self.assertEqual(delta["cursor"], cursor + 2)
+        self.assertEqual(delta_stage_names(delta), ["Day 1", "Day 2"])
+        self.assertEqual(self.delta(delta["cursor"])["changes"], {})
+
+    def test_cursor_ahead_of_the_trip_requires_resync(self):
+        version = Trip.objects.get(pk=self.trip.pk).version
+        self.assertIsNone(self.delta(version + 1))
+
+    def test_cursor_older_than_the_retained_log_requires_resync(self):
+        cursor = Trip.objects.get(pk=self.trip.pk).version
+        Stage.objects.create(name="Day 1", category="sightseeing", trip=self.trip)
+        TripChange.objects.filter(trip_id=self.trip.pk).delete()
+        self.assertIsNone(self.delta(cursor))
+        self.assertIsNotNone(self.delta(cursor + 1))
+
+
+class TripSyncConcurrencyTests(TransactionTestCase):
+    def test_cursor_does_not_pass_a_change_committed_later(self):
+        owner = Profile.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        trip = create_trip(owner)
+        cursor = Trip.objects.get(pk=trip.pk).version
+        first_logged = threading.Event()
+        release_first = threading.Event()
+
+        def first_writer():
+            try:
+                with transaction.atomic():
+                    Stage.objects.create(name="First", category="sightseeing", trip_id=trip.pk)
+                    first_logged.set()
+                    release_first.wait(10)
+            finally:
+                connection.close()
+
+        def second_writer():
+            try:
+                Stage.objects.create(name="Second", category="sightseeing", trip_id=trip.pk)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=first_writer)
+        first.start()
+        self.assertTrue(first_logged.wait(10))
+        second = threading.Thread(target=second_writer)
+        second.start()
+        try:
+            # The second writer cannot number its change until the first one commits
+            second.join(0.5)
+            self.assertTrue(second.is_alive())
+            delta = build_delta(Trip.objects.get(pk=trip.pk), sync_request(owner), cursor)
+            self.assertEqual(delta["cursor"], cursor)
+            self.assertEqual(delta["changes"], {})
+        finally:
+            release_first.set()
+            first.join(10)
+            second.join(10)
+
+        delta = build_delta(Trip.objects.get(pk=trip.pk), sync_request(owner), cursor)
+        self.assertEqual(delta["cursor"], cursor + 2)
+        self.assertEqual(delta_stage_names(delta), ["First", "Second"])
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class TripConsumerTests(TransactionTestCase):
+    def setUp(self):
+        clear_redis()
+        self.owner = Profile.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.member = Profile.objects.create_user(username="member", email="member@example.com", password="pw")
+        self.trip = create_trip(self.owner)
+        self.trip.participants.add(self.member)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(TripConsumer.as_asgi(), f"/ws/trips/{self.trip.pk}/")
+        communicator.scope["user"] = user
+        communicator.scope["url_route"] = {"kwargs": {"pk": self.trip.pk}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_removed_member_is_disconnected(self):
+        async def scenario():
+            owner_socket = await self.connect(self.owner)
+            member_socket = await self.connect(self.member)
+            await database_sync_to_async(self.trip.participants.remove)(self.member)
+
+            self.assertEqual((await member_socket.receive_json_from())["type"], "trip.changed")
+            self.assertEqual(await member_socket.receive_output(), {"type": "websocket.close", "code": 4003})
+            self.assertEqual((await owner_socket.receive_json_from())["type"], "trip.changed")
+            self.assertTrue(await owner_socket.receive_nothing())
+            await owner_socket.disconnect()
+
+        async_to_sync(scenario)()
+
+
+class ResponseCacheStatsTests(TestCase):
+    def setUp(self):
+        clear_redis()
+        self.owner = Profile.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.trip = create_trip(self.owner)
+
+    def test_command_reports_hits_and_misses_per_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        for _ in range(2):
+            self.assertEqual(client.get("/api/trips/stage/", {"trip_id": self.trip.pk}).status_code, 200)
+
+        out = StringIO()
+        call_command("response_cache_stats", "--reset", stdout=out)
+        self.assertIn("stages: 1 hits, 1 misses, 50.0% hit rate", out.getvalue())
+        out = StringIO()
+        call_command("response_cache_stats", stdout=out)
+        self.assertIn("No response cache traffic recorded", out.getvalue())
+
+
+class TripInviteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Profile.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        cls.invitee = Profile.objects.create_user(username="friend", email="friend@example.com", password="pw")
+        cls.trip = create_trip(cls.owner)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def invite(self, **data):
+        return self.client.post(f"/api/trips/trip/{self.trip.pk}/invite/", data, format="json")
+
+    def test_invitation_is_created_with_its_email(self):
+        response = self.invite(invitee_id=self.invitee.pk)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(TripInvitation.objects.filter(trip=self.trip, invitee=self.invitee).exists())
+        self.assertEqual(OutboundEmail.objects.filter(to=[self.invitee.email]).count(), 1)
+
+    def test_failed_email_rolls_back_the_invitation(self):
+        with mock.patch("trip.views.send_trip_invitation_emails", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.invite(invitee_id=self.invitee.pk)
+        self.assertFalse(TripInvitation.objects.filter(trip=self.trip).exists())
+        self.assertFalse(Notification.objects.filter(recipient=self.invitee).exists())
+
+    def test_batch_invite_queues_every_email_in_one_insert(self):
+        other = Profile.objects.create_user(username="other", email="other@example.com", password="pw")
+        with mock.patch.object(OutboundEmail.objects, "bulk_create", wraps=OutboundEmail.objects.bulk_create) as bulk_create:
+            response = self.invite(invitee_ids=[self.invitee.pk, other.pk])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(invitation["invitee"]["id"] for invitation in response.data), sorted([self.invitee.pk, other.pk]))
+        bulk_create.assert_called_once()
+        self.assertEqual(OutboundEmail.objects.filter(to__in=[[self.invitee.email], [other.email]]).count(), 2)
+
+    def test_batch_invite_is_all_or_nothing(self):
+        self.trip.participants.add(self.invitee)
+        other = Profile.objects.create_user(username="other", email="other@example.com", password="pw")
+        response = self.invite(invitee_ids=[other.pk, self.invitee.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TripInvitation.objects.filter(trip=self.trip).exists())
+
+    def test_reminder_goes_through_the_notification_pipeline(self):
+        clear_redis()
+        invitation = TripInvitation.objects.create(
+            trip=self.trip, inviter=self.owner, invitee=self.invitee,
+            expires_at=timezone.now() + timedelta(hours=24, minutes=30),
+        )
+        self.assertEqual(get_unread_count(self.invitee.pk, lambda: 0), 0)
+
+        send_invitation_reminder()
+
+        notification = Notification.objects.get(recipient=self.invitee, notification_type="trip_invite_reminder")
+        self.assertEqual(
+            (notification.sender_id, notification.related_object_id, notification.related_trip_id),
+            (self.owner.pk, invitation.pk, self.trip.pk),
+        )
+        self.assertEqual(get_unread_count(self.invitee.pk, lambda: 0), 1)
+
+
+@skipUnless(connection.vendor == "postgresql", "Index plans are PostgreSQL specific")
+class TripIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Profile.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        cls.trip = create_trip(cls.owner)
+
+    def assertUsesIndex(self, queryset, index_name):
+        # Test tables are tiny, so take sequential scans off the table to see which index the planner picks
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertIn(index_name, queryset.explain())
+
+    def test_shared_documents_use_the_visibility_index(self):
+        self.assertUsesIndex(
+            Document.objects.filter(trip=self.trip, visibility="shared").order_by("-created_at"),
+            "document_trip_visibility_idx",
+        )
+
+    def test_invitation_expiry_uses_the_status_index(self):
+        self.assertUsesIndex(
+            TripInvitation.objects.filter(status="pending", expires_at__lt=timezone.now() + timedelta(days=1)),
+            "tripinv_status_expires_idx",
+        )
@@ -6,6 +6,7 @@ urlpatterns = [
 	path('trip/', views.TripListView.as_view(), name='trip-list'),
 	path('trip/<int:pk>/', views.TripDetailView.as_view(), name='trip-detail'),
 	path("trip/<int:pk>/invite/", views.TripInviteView.as_view(), name="trip-invite"),
+	path('trip/<int:pk>/sync/', views.TripSyncView.as_view(), name='trip-sync'),
 	path('trip/<int:pk>/reorder-stages/', views.ReorderStagesView.as_view(), name='reorder-stages'),
 	path('trip/<int:pk>/participants/<int:participant_id>/', views.TripRemoveParticipantView.as_view(),
 		 name='trip-remove-participant'),
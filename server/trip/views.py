@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Avg, Q, Count, Case, When, IntegerField, F
 from django.shortcuts import get_object_or_404
@@ -31,9 +32,14 @@ from .serializers import (
     TripMapSettingsSerializer,
     MapSpawnPointSerializer,
 )
-from user_account.models import Notification
-from user_account.models import UserPreferences as AccountUserPreferences
-from user_account.utils import send_trip_invitation_email
+from user_account.notifications import notify_users
+from user_account.throttling import TripInviteRateThrottle
+from user_account.utils import send_trip_invitation_emails
+from .changes import record_changes
+from .conditional import trip_condition
+from .response_cache import cache_trip_response
+from .notifications import notify_trip_members
+from .sync import build_delta, build_snapshot
 
 User = get_user_model()
 
@@ -89,6 +95,7 @@ class TripDetailView(GenericAPIView):
 				return trip
 			return None
 
+	@trip_condition
 	def get(self, request, pk):
 		trip = self.get_object(pk)
 		if not trip:
@@ -126,6 +133,7 @@ class TripDetailView(GenericAPIView):
 
 class TripInviteView(APIView):
 	permission_classes = [permissions.IsAuthenticated]
+	throttle_classes = [TripInviteRateThrottle]
 
 	def post(self, request, pk):
 		try:
@@ -147,72 +155,90 @@ class TripInviteView(APIView):
 				status=status.HTTP_403_FORBIDDEN
 			)
 
-		invitee_id = request.data.get("invitee_id")
-		if not invitee_id:
+		# Either a single "invitee_id" or a batch of "invitee_ids"
+		batch = "invitee_ids" in request.data
+		invitee_ids = request.data.get("invitee_ids") if batch else [request.data.get("invitee_id")]
+		if not isinstance(invitee_ids, list) or not invitee_ids or not all(invitee_ids):
 			return Response(
 				{"detail": "invitee_id is required."}, status=status.HTTP_400_BAD_REQUEST
 			)
-
 		try:
-			invitee = User.objects.get(id=invitee_id)
-		except User.DoesNotExist:
+			invitee_ids = list(dict.fromkeys(int(invitee_id) for invitee_id in invitee_ids))
+		except (TypeError, ValueError):
+			return Response(
+				{"detail": "Invalid invitee id."}, status=status.HTTP_400_BAD_REQUEST
+			)
+		if len(invitee_ids) > settings.RATE_LIMITS["trip_invite"][0]:
+			return Response(
+				{"detail": "Too many invitees."}, status=status.HTTP_400_BAD_REQUEST
+			)
+
+		invitees = User.objects.in_bulk(invitee_ids)
+		if len(invitees) != len(invitee_ids):
 			return Response(
 				{"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND
 			)
 
-		if trip.participants.filter(id=invitee_id).exists():
+		if trip.participants.filter(id__in=invitee_ids).exists():
 			return Response(
 				{"detail": "User is already a participant."}, status=status.HTTP_400_BAD_REQUEST
 			)
 
-		existing_invitation = TripInvitation.objects.filter(
-			trip=trip,
-			invitee=invitee,
-			status='pending'
-		).first()
+		existing_invitations = {
+			invitation.invitee_id: invitation
+			for invitation in TripInvitation.objects.filter(
+				trip=trip,
+				invitee_id__in=invitee_ids,
+				status='pending'
+			)
+		}
 
-		if existing_invitation and not existing_invitation.is_expired():
+		if any(not invitation.is_expired() for invitation in existing_invitations.values()):
 			return Response(
 				{"detail": "Invitation already sent."}, status=status.HTTP_400_BAD_REQUEST
 			)
 
-		if existing_invitation and existing_invitation.is_expired():
-			existing_invitation.status = 'pending'
-			existing_invitation.inviter = request.user
-			existing_invitation.expires_at = timezone.now() + timezone.timedelta(days=7)
-			existing_invitation.save()
-			invitation = existing_invitation
-		else:
-			invitation = TripInvitation.objects.create(
-				trip=trip,
-				inviter=request.user,
-				invitee=invitee
-			)
+		# The invitations, their notifications and their outbox emails commit together or not at all
+		with transaction.atomic():
+			invitations = []
+			for invitee_id in invitee_ids:
+				invitation = existing_invitations.get(invitee_id)
+				if invitation:
+					invitation.inviter = request.user
+					invitation.expires_at = timezone.now() + timezone.timedelta(days=7)
+					invitation.save()
+				else:
+					invitation = TripInvitation.objects.create(
+						trip=trip,
+						inviter=request.user,
+						invitee=invitees[invitee_id]
+					)
+				invitations.append(invitation)
 
-		Notification.objects.create(
-			recipient=invitee,
-			sender=request.user,
-			notification_type='trip_invite',
-			title='Trip Invitation',
-			message=f'{request.user.username} invited you to join "{trip.name}"',
-			related_object_id=invitation.id
-		)
+				notify_users([invitee_id], {
+					'sender': request.user,
+					'notification_type': 'trip_invite',
+					'title': 'Trip Invitation',
+					'message': f'{request.user.username} invited you to join "{trip.name}"',
+					'related_object_id': invitation.id,
+				})
 
-		try:
-			send_trip_invitation_email(invitation)
-		except Exception as e:
-			print(f"Failed to send invitation email: {e}")
+			send_trip_invitation_emails(invitations)
 
-		serializer = TripInvitationSerializer(invitation, context={'request': request})
+		serializer = TripInvitationSerializer(
+			invitations if batch else invitations[0], many=batch, context={'request': request}
+		)
 		return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 class TripInvitationResponseView(APIView):
 	permission_classes = [permissions.IsAuthenticated]
 
+	@transaction.atomic
 	def put(self, request, pk):
 		try:
-			invitation = TripInvitation.objects.get(pk=pk, invitee=request.user)
+			# Lock the invitation so a double-submitted accept only adds the participant once
+			invitation = TripInvitation.objects.select_for_update().get(pk=pk, invitee=request.user)
 		except TripInvitation.DoesNotExist:
 			return Response(
 				{"detail": "Invitation not found."}, status=status.HTTP_404_NOT_FOUND
@@ -244,16 +270,13 @@ class TripInvitationResponseView(APIView):
 			invitation.status = "accepted"
 			invitation.trip.participants.add(invitation.invitee)
 
-			existing_participants = invitation.trip.participants.exclude(id=invitation.invitee.id)
-			for participant in existing_participants:
-				Notification.objects.create(
-					recipient=participant,
-					sender=invitation.invitee,
-					notification_type='trip_update',
-					title='New Trip Member',
-					message=f'{invitation.invitee.username} joined "{invitation.trip.name}"',
-					related_object_id=invitation.trip.id
-				)
+			notify_trip_members(invitation.trip, {
+				'sender': invitation.invitee,
+				'notification_type': 'trip_update',
+				'title': 'New Trip Member',
+				'message': f'{invitation.invitee.username} joined "{invitation.trip.name}"',
+				'related_object_id': invitation.trip.id,
+			}, exclude=[invitation.invitee])
 		else:
 			invitation.status = "rejected"
 
@@ -300,25 +323,21 @@ class TripRemoveParticipantView(APIView):
 
 		trip.participants.remove(participant)
 
-		Notification.objects.create(
-			recipient=participant,
-			sender=request.user,
-			notification_type='trip_update',
-			title='Removed from Trip',
-			message=f'You have been removed from "{trip.name}" by {request.user.username}',
-			related_object_id=trip.id
-		)
-
-		remaining_participants = trip.participants.exclude(id=request.user.id)
-		for other_participant in remaining_participants:
-			Notification.objects.create(
-				recipient=other_participant,
-				sender=request.user,
-				notification_type='trip_update',
-				title='Trip Member Removed',
-				message=f'{participant.username} was removed from "{trip.name}"',
-				related_object_id=trip.id
-			)
+		notify_users([participant.id], {
+			'sender': request.user,
+			'notification_type': 'trip_update',
+			'title': 'Removed from Trip',
+			'message': f'You have been removed from "{trip.name}" by {request.user.username}',
+			'related_object_id': trip.id,
+		})
+
+		notify_trip_members(trip, {
+			'sender': request.user,
+			'notification_type': 'trip_update',
+			'title': 'Trip Member Removed',
+			'message': f'{participant.username} was removed from "{trip.name}"',
+			'related_object_id': trip.id,
+		}, exclude=[request.user])
 
 		return Response(
 			{"detail": f"{participant.username} has been removed from the trip."},
@@ -356,16 +375,48 @@ class ReorderStagesView(APIView):
 		with transaction.atomic():
 			for index, stage_id in enumerate(stage_ids):
 				Stage.objects.filter(id=stage_id, trip=trip).update(order=index)
+			record_changes(trip.id, "stage", "updated", stage_ids)
 
 		return Response(
 			{"detail": "Stages reordered successfully."}, status=status.HTTP_200_OK
 		)
 
 
+class TripSyncView(APIView):
+	"""
+	Delta sync for offline clients. Without `since` (or with a cursor older than
+	the retained change log) the full trip state is returned; otherwise only the
+	objects created, updated or deleted after the cursor.
+	"""
+	permission_classes = [permissions.IsAuthenticated]
+
+	def get(self, request, pk):
+		trip = Trip.objects.filter(
+			Q(pk=pk) & (Q(owner=request.user) | Q(participants=request.user))
+		).distinct().first()
+		if not trip:
+			return Response({"detail": "Trip not found."}, status=status.HTTP_404_NOT_FOUND)
+
+		since = request.query_params.get("since")
+		if since is None:
+			return Response(build_snapshot(trip, request), status=status.HTTP_200_OK)
+		try:
+			since = int(since)
+		except ValueError:
+			return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+		delta = build_delta(trip, request, since)
+		if delta is None:
+			return Response({**build_snapshot(trip, request), "reset": True}, status=status.HTTP_200_OK)
+		return Response(delta, status=status.HTTP_200_OK)
+
+
 class StageListView(GenericAPIView):
 	permission_classes = [permissions.IsAuthenticated]
 	serializer_class = StageListSerializer
 
+	@trip_condition
+	@cache_trip_response("stages")
 	def get(self, request):
 		user = request.user
 		trip_id = request.query_params.get("trip_id")
@@ -490,6 +541,8 @@ class BatchCreateStagesView(APIView):
 					stage = serializer.save()
 					created_stages.append(StageSerializer(stage).data)
 				else:
+					# Discard the stages already created in this batch
+					transaction.set_rollback(True)
 					return Response(
 						serializer.errors, status=status.HTTP_400_BAD_REQUEST
 					)
@@ -633,6 +686,7 @@ class PackingListView(GenericAPIView):
 		except Trip.DoesNotExist:
 			return None
 
+	@trip_condition
 	def get(self, request, pk):
 		trip = self.get_trip(request, pk)
 		if not trip:
@@ -717,6 +771,7 @@ class PackingItemView(GenericAPIView):
 		packing_list = PackingList.objects.filter(pk=list_id, trip=trip).first()
 		return trip, packing_list
 
+	@trip_condition
 	def get(self, request, pk, list_id):
 		trip, packing_list = self.get_trip_and_list(request, pk, list_id)
 		if not packing_list:
@@ -757,23 +812,14 @@ class PackingItemView(GenericAPIView):
 			item.assigned_to = user
 		item.save()
 		if packing_list.list_type == 'shared':
-			for participant in trip.participants.all():
-				if participant != request.user:
-					try:
-						prefs = participant.preferences
-						cfg = (prefs.data or {}).get('notifications', {})
-						if cfg.get('packing_list_added') is False:
-							continue
-					except AccountUserPreferences.DoesNotExist:
-						pass
-					Notification.objects.create(
-						recipient=participant,
-						sender=request.user,
-						notification_type='packing_added',
-						title='New packing item',
-						message=f'{request.user.username} added "{item.name}" to {packing_list.name}',
-						related_object_id=item.id,
-					)
+			notify_trip_members(trip, {
+				'sender': request.user,
+				'notification_type': 'packing_added',
+				'title': 'New packing item',
+				'message': f'{request.user.username} added "{item.name}" to {packing_list.name}',
+				'related_object_id': item.id,
+				'preference_key': 'packing_list_added',
+			}, exclude=[request.user])
 		return Response(self.get_serializer(item).data, status=status.HTTP_201_CREATED)
 
 
@@ -855,6 +901,7 @@ class DocumentCategoryView(APIView):
 class DocumentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @trip_condition
     def get(self, request, trip_id):
         """Get all documents for a trip"""
         trip = get_object_or_404(Trip, id=trip_id)
@@ -910,23 +957,14 @@ class DocumentView(APIView):
             # Create notification for new document
             if document.visibility == 'shared':
                 # Notify trip participants about new shared document
-                for participant in trip.participants.all():
-                    if participant != request.user:
-                        try:
-                            prefs = participant.preferences
-                            cfg = (prefs.data or {}).get('notifications', {})
-                            if cfg.get('document_added') is False:
-                                continue
-                        except AccountUserPreferences.DoesNotExist:
-                            pass
-                        Notification.objects.create(
-                            recipient=participant,
-                            sender=request.user,
-                            notification_type='document_added',
-                            title='New document uploaded',
-                            message=f'{request.user.username} uploaded "{document.title}"',
-                            related_object_id=document.id,
-                        )
+                notify_trip_members(trip, {
+                    'sender': request.user,
+                    'notification_type': 'document_added',
+                    'title': 'New document uploaded',
+                    'message': f'{request.user.username} uploaded "{document.title}"',
+                    'related_object_id': document.id,
+                    'preference_key': 'document_added',
+                }, exclude=[request.user])
             
             response_serializer = DocumentSerializer(document, context={'request': request})
             return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -983,6 +1021,7 @@ class DocumentDetailView(APIView):
 class DocumentCommentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @trip_condition
     def get(self, request, trip_id, document_id):
         """Get comments for a document"""
         trip = get_object_or_404(Trip, id=trip_id)
@@ -1072,6 +1111,7 @@ class ExpenseListCreateView(GenericAPIView):
         except Trip.DoesNotExist:
             return None
 
+    @trip_condition
     def get(self, request, pk):
         trip = self.get_trip(request, pk)
         if not trip:
@@ -1087,23 +1127,14 @@ class ExpenseListCreateView(GenericAPIView):
         serializer = self.get_serializer(data=request.data, context={"request": request, "trip": trip})
         if serializer.is_valid():
             expense = serializer.save()
-            for participant in trip.participants.all():
-                if participant != request.user:
-                    try:
-                        prefs = participant.preferences
-                        cfg = (prefs.data or {}).get('notifications', {})
-                        if cfg.get('expense_added') is False:
-                            continue
-                    except AccountUserPreferences.DoesNotExist:
-                        pass
-                    Notification.objects.create(
-                        recipient=participant,
-                        sender=request.user,
-                        notification_type='expense_update',
-                        title='New expense added',
-                        message=f'{request.user.username} added an expense: {expense.description} ({expense.amount} {expense.currency})',
-                        related_object_id=expense.id,
-                    )
+            notify_trip_members(trip, {
+                'sender': request.user,
+                'notification_type': 'expense_update',
+                'title': 'New expense added',
+                'message': f'{request.user.username} added an expense: {expense.description} ({expense.amount} {expense.currency})',
+                'related_object_id': expense.id,
+                'preference_key': 'expense_added',
+            }, exclude=[request.user])
             return Response(self.get_serializer(expense).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1155,6 +1186,7 @@ class SettlementListCreateView(GenericAPIView):
         except Trip.DoesNotExist:
             return None
 
+    @trip_condition
     def get(self, request, pk):
         trip = self.get_trip(request, pk)
         if not trip:
@@ -1177,6 +1209,7 @@ class SettlementListCreateView(GenericAPIView):
 class TripBalanceView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @trip_condition
     def get(self, request, pk):
         try:
             trip = Trip.objects.filter(
@@ -1229,6 +1262,8 @@ class ItineraryEventListCreateView(GenericAPIView):
         except Trip.DoesNotExist:
             return None
 
+    @trip_condition
+    @cache_trip_response("itinerary_events")
     def get(self, request, pk):
         trip = self.get_trip(request, pk)
         if not trip:
@@ -1297,6 +1332,7 @@ class TripMapPinListCreateView(GenericAPIView):
         except Trip.DoesNotExist:
             return None
 
+    @trip_condition
     def get(self, request, pk):
         trip = self.get_trip(request, pk)
         if not trip:
@@ -1368,6 +1404,8 @@ class TripMapSettingsView(GenericAPIView):
         except Trip.DoesNotExist:
             return None
 
+    @trip_condition
+    @cache_trip_response("map_settings")
     def get(self, request, pk):
         trip = self.get_trip(request, pk)
         if not trip:
@@ -1401,6 +1439,8 @@ class MapSpawnPointListCreateView(GenericAPIView):
         except Trip.DoesNotExist:
             return None
 
+    @trip_condition
+    @cache_trip_response("map_spawn_points")
     def get(self, request, pk):
         trip = self.get_trip(request, pk)
         if not trip:
@@ -10,17 +10,24 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from user_account.routing import websocket_urlpatterns
+
+os.environ.setdefault("TRIPWHIZZ_PROCESS_ROLE", "asgi")
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tripwhizz.settings")
 
+# Initialise Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from trip.routing import websocket_urlpatterns as trip_websocket_urlpatterns  # noqa: E402
+from user_account.middleware import TokenAuthMiddlewareStack  # noqa: E402
+from user_account.routing import websocket_urlpatterns  # noqa: E402
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "http": django_asgi_app,
+    "websocket": TokenAuthMiddlewareStack(
         URLRouter(
-            websocket_urlpatterns
+            websocket_urlpatterns + trip_websocket_urlpatterns
         )
     ),
 })
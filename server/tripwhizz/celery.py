@@ -1,9 +1,14 @@
 import os
+import sys
 
 from celery import Celery
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tripwhizz.settings')
 
+# Workers and beat get their own database connection settings (see PROCESS_ROLE in settings)
+if os.path.basename(sys.argv[0]) == 'celery':
+    os.environ.setdefault('TRIPWHIZZ_PROCESS_ROLE', 'celery')
+
 app = Celery('tripwhizz')
 
 app.config_from_object('django.conf:settings', namespace='CELERY')
@@ -19,6 +24,40 @@ app.conf.beat_schedule = {
         'task': 'trip.tasks.send_invitation_reminder',
         'schedule': 3600.0 * 6,
     },
+    'prune-trip-changes': {
+        'task': 'trip.tasks.prune_trip_changes',
+        'schedule': 3600.0 * 24,
+    },
+    'reconcile-unread-notification-counts': {
+        'task': 'user_account.tasks.reconcile_unread_notification_counts',
+        'schedule': 3600.0,
+    },
+    'send-hourly-notification-digests': {
+        'task': 'user_account.tasks.send_notification_digests',
+        'schedule': 3600.0,
+        'args': ('hourly',),
+    },
+    'send-daily-notification-digests': {
+        'task': 'user_account.tasks.send_notification_digests',
+        'schedule': 3600.0 * 24,
+        'args': ('daily',),
+    },
+    'archive-old-notifications': {
+        'task': 'user_account.tasks.archive_old_notifications',
+        'schedule': 3600.0 * 24,
+    },
+    'dispatch-outbound-email-batches': {
+        'task': 'user_account.tasks.dispatch_outbound_email_batches',
+        'schedule': 15.0,
+    },
+    'requeue-stale-outbound-emails': {
+        'task': 'user_account.tasks.requeue_stale_outbound_emails',
+        'schedule': 300.0,
+    },
+    'refresh-friend-suggestions': {
+        'task': 'user_account.tasks.refresh_friend_suggestions',
+        'schedule': 300.0,
+    },
 }
 
 app.conf.timezone = 'UTC'
@@ -0,0 +1,114 @@
+import hashlib
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB = "replica"
+PRIMARY_DB = "default"
+PIN_KEY = "db:primary_pin:{identity}"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Route ORM reads inside the block to the replica, if one is configured"""
+    token = _read_from_replica.set(replica_configured())
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def use_replica(func):
+    """Decorator form of replica_reads() for Celery tasks that only report on data"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to the replica only where replica_reads() is active; every
+    write, and every read outside it, goes to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        return REPLICA_DB if _read_from_replica.get() else PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DB
+
+
+def request_identity(request):
+    """
+    Stable key for the client making the request. Token auth runs inside the
+    view, so the Authorization header is used rather than request.user.
+    """
+    auth = request.META.get("HTTP_AUTHORIZATION")
+    if auth:
+        return hashlib.sha256(auth.encode()).hexdigest()[:32]
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serves safe-method requests from the replica. A client that sent a write
+    is pinned to the primary for DB_REPLICA_PIN_SECONDS so it reads its own
+    writes. Disabled when no replica is configured.
+    """
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        identity = request_identity(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if identity:
+                self.pin(identity)
+            return response
+
+        if identity and self.is_pinned(identity):
+            return self.get_response(request)
+        with replica_reads():
+            return self.get_response(request)
+
+    def pin(self, identity):
+        from user_account.redis_utils import get_redis_connection
+        try:
+            get_redis_connection().set(PIN_KEY.format(identity=identity), 1, ex=settings.DB_REPLICA_PIN_SECONDS)
+        except RedisError:
+            logger.warning("Failed to pin client to the primary database")
+
+    def is_pinned(self, identity):
+        from user_account.redis_utils import get_redis_connection
+        try:
+            return bool(get_redis_connection().exists(PIN_KEY.format(identity=identity)))
+        except RedisError:
+            # Without the pin we cannot promise read-your-writes, so stay on the primary
+            return True
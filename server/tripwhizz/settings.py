@@ -34,12 +34,14 @@ ALLOWED_HOSTS = json.loads(os.environ.get('DJANGO_ALLOWED_HOSTS', default='[]'))
 # Application definition
 
 INSTALLED_APPS = [
+   "daphne",
    "django.contrib.admin",
    "django.contrib.auth",
    "django.contrib.contenttypes",
    "django.contrib.sessions",
    "django.contrib.messages",
    "django.contrib.staticfiles",
+   "django.contrib.postgres",
    "rest_framework",
    "rest_framework.authtoken",
    "corsheaders",
@@ -53,10 +55,15 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
    "DEFAULT_AUTHENTICATION_CLASSES": [
-       "rest_framework.authentication.TokenAuthentication",
+       "user_account.authentication.CachedTokenAuthentication",
    ],
 }
 
+# Token -> user snapshots: Redis TTL, and TTL/size of the per-process cache in front of it
+TOKEN_AUTH_CACHE_TTL = int(os.getenv("TOKEN_AUTH_CACHE_TTL", 300))
+TOKEN_AUTH_LOCAL_CACHE_TTL = int(os.getenv("TOKEN_AUTH_LOCAL_CACHE_TTL", 5))
+TOKEN_AUTH_LOCAL_CACHE_SIZE = int(os.getenv("TOKEN_AUTH_LOCAL_CACHE_SIZE", 1024))
+
 MIDDLEWARE = [
    "corsheaders.middleware.CorsMiddleware",
    "django.middleware.security.SecurityMiddleware",
@@ -64,6 +71,7 @@ MIDDLEWARE = [
    "django.middleware.common.CommonMiddleware",
    "django.middleware.csrf.CsrfViewMiddleware",
    "django.contrib.auth.middleware.AuthenticationMiddleware",
+   "tripwhizz.db_router.ReplicaRoutingMiddleware",
    "django.contrib.messages.middleware.MessageMiddleware",
    "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -95,6 +103,24 @@ ASGI_APPLICATION = "tripwhizz.asgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Process kind that loaded the settings: "web", "asgi" or "celery". asgi.py and
+# celery.py set it; DB_<OPTION>_<ROLE> overrides DB_<OPTION> for that process kind.
+PROCESS_ROLE = os.getenv("TRIPWHIZZ_PROCESS_ROLE", "web")
+
+DB_ROLE_DEFAULTS = {
+    # Sync workers keep one connection per thread open between requests
+    "web": {"CONN_MAX_AGE": 60, "POOL": "False", "POOL_MIN_SIZE": 2, "POOL_MAX_SIZE": 10},
+    # ASGI runs ORM calls on a thread pool, so a shared pool bounds the connection count
+    "asgi": {"CONN_MAX_AGE": 0, "POOL": "True", "POOL_MIN_SIZE": 2, "POOL_MAX_SIZE": 20},
+    "celery": {"CONN_MAX_AGE": 300, "POOL": "False", "POOL_MIN_SIZE": 1, "POOL_MAX_SIZE": 4},
+}
+
+
+def db_env(option):
+    default = DB_ROLE_DEFAULTS.get(PROCESS_ROLE, DB_ROLE_DEFAULTS["web"])[option]
+    return os.getenv(f"DB_{option}_{PROCESS_ROLE.upper()}", os.getenv(f"DB_{option}", default))
+
+
 DATABASES = {
    "default": {
        "ENGINE": "django.db.backends.postgresql",
@@ -103,10 +129,43 @@ DATABASES = {
        "PASSWORD": os.getenv("DB_PASSWORD"),
        "HOST": os.getenv("DB_HOST"),
        "PORT": os.getenv("DB_PORT"),
-       'ATOMIC_REQUESTS': True,
+       # Views open transactions explicitly around multi-write sections
+       'ATOMIC_REQUESTS': False,
+       "CONN_MAX_AGE": int(db_env("CONN_MAX_AGE")),
+       "CONN_HEALTH_CHECKS": True,
+       "OPTIONS": {},
    }
 }
 
+# psycopg 3 connection pool; Django requires persistent connections to be off when it is used
+if db_env("POOL") == "True":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(db_env("POOL_MIN_SIZE")),
+        "max_size": int(db_env("POOL_MAX_SIZE")),
+        "timeout": int(os.getenv("DB_POOL_TIMEOUT", 10)),
+        "max_idle": int(os.getenv("DB_POOL_MAX_IDLE", 300)),
+    }
+
+# Optional read replica: safe-method requests and reporting tasks read from it,
+# everything else (and everything when it is not configured) uses the primary
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "OPTIONS": {**DATABASES["default"]["OPTIONS"]},
+        "NAME": os.getenv("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "ATOMIC_REQUESTS": False,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["tripwhizz.db_router.PrimaryReplicaRouter"]
+# How long a client reads from the primary after sending a write
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", 10))
+
 AUTH_USER_MODEL = "user_account.Profile"
 
 # Password validation
@@ -164,6 +223,15 @@ if not REDIS_URL:
 
     REDIS_URL = f"redis://{':' + REDIS_PASSWORD + '@' if REDIS_PASSWORD else ''}{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
+# Per-process connection pool used by user_account.redis_utils.get_redis_connection
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+# The test runner moves get_redis_connection to this database so tests can empty it freely
+REDIS_TEST_DB = int(os.getenv("REDIS_TEST_DB", 15))
+
+TEST_RUNNER = "tripwhizz.test_runner.TestRunner"
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -183,11 +251,45 @@ CELERY_TASK_TRACK_STARTED = os.getenv("CELERY_TASK_TRACK_STARTED", "True") == "T
 CELERY_TASK_TIME_LIMIT = int(os.getenv("CELERY_TASK_TIME_LIMIT"))
 CELERY_BEAT_SCHEDULER = os.getenv("CELERY_BEAT_SCHEDULER")
 
+NOTIFICATION_UNREAD_COUNT_TTL = int(os.getenv("NOTIFICATION_UNREAD_COUNT_TTL", 86400))
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 90))
+NOTIFICATION_COALESCE_WINDOW = int(os.getenv("NOTIFICATION_COALESCE_WINDOW", 300))
+
+FRIEND_SET_TTL = int(os.getenv("FRIEND_SET_TTL", 86400))
+FRIEND_SEARCH_LIMIT = int(os.getenv("FRIEND_SEARCH_LIMIT", 20))
+FRIEND_SUGGESTION_LIMIT = int(os.getenv("FRIEND_SUGGESTION_LIMIT", 20))
+FRIEND_SUGGESTION_TTL = int(os.getenv("FRIEND_SUGGESTION_TTL", 86400))
+
+SYNC_MAX_CHANGES = int(os.getenv("SYNC_MAX_CHANGES", 1000))
+SYNC_CHANGE_RETENTION_DAYS = int(os.getenv("SYNC_CHANGE_RETENTION_DAYS", 30))
+
+TRIP_RESPONSE_CACHE_TTL = int(os.getenv("TRIP_RESPONSE_CACHE_TTL", 300))
+# Comma-separated endpoint names, e.g. "stages,itinerary_events"
+TRIP_RESPONSE_CACHE_DISABLED = [
+    name for name in os.getenv("TRIP_RESPONSE_CACHE_DISABLED", "").split(",") if name
+]
+
 FRIEND_REQUEST_RATE_LIMIT = {
     "max_requests": int(os.getenv("FRIEND_REQUEST_RATE_LIMIT_MAX_REQUESTS", 10)),
     "time_window": int(os.getenv("FRIEND_REQUEST_RATE_LIMIT_TIME_WINDOW", 3600)),
 }
 
+# Lifetime of a pending signup (OTP and hashed password) in Redis
+SIGNUP_SESSION_TTL = int(os.getenv("SIGNUP_SESSION_TTL", 600))
+
+# (requests, seconds) per throttle scope, see user_account.throttling
+RATE_LIMITS = {
+    "login": (10, 60),
+    "otp_verify": (5, 600),
+    "resend_otp": (3, 600),
+    "password_reset": (3, 3600),
+    "trip_invite": (30, 3600),
+    "friend_request": (
+        FRIEND_REQUEST_RATE_LIMIT["max_requests"],
+        FRIEND_REQUEST_RATE_LIMIT["time_window"],
+    ),
+}
+
 EMAIL_BACKEND = os.getenv("EMAIL_BACKEND")
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = os.getenv("EMAIL_PORT")
@@ -195,4 +297,18 @@ EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS")
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "user_account.email_transport.ResendTransport")
+EMAIL_HTTP_TIMEOUT = float(os.getenv("EMAIL_HTTP_TIMEOUT", 10))
+EMAIL_HTTP_POOL_SIZE = int(os.getenv("EMAIL_HTTP_POOL_SIZE", 10))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", 5))
+EMAIL_RETRY_BACKOFF = int(os.getenv("EMAIL_RETRY_BACKOFF", 30))
+EMAIL_STALE_AFTER = int(os.getenv("EMAIL_STALE_AFTER", 600))
+# A claimed ("sending") email whose worker has not finished within this many seconds is requeued
+EMAIL_SENDING_LEASE = int(os.getenv("EMAIL_SENDING_LEASE", 300))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 100))
 FRONTEND_URL = os.getenv("FRONTEND_URL")
+
+GOOGLE_RESPONSE_URL = os.getenv("GOOGLE_RESPONSE_URL")
+GOOGLE_HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", 5))
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", 10))
+GOOGLE_USERINFO_CACHE_TTL = int(os.getenv("GOOGLE_USERINFO_CACHE_TTL", 60))
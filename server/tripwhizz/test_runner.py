@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.runner import DiscoverRunner
+
+from user_account import redis_utils
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the suite against REDIS_TEST_DB instead of the Redis database the
+    settings point at, so tests can clear it without touching development data.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if redis_utils.create_connection_pool().connection_kwargs.get("db", 0) == settings.REDIS_TEST_DB:
+            raise ImproperlyConfigured("REDIS_TEST_DB must differ from the Redis database in use")
+        redis_utils.use_database(settings.REDIS_TEST_DB)
+
+    def teardown_test_environment(self, **kwargs):
+        redis_utils.use_database(None)
+        super().teardown_test_environment(**kwargs)
+
+
+def clear_redis():
+    """Empty the test Redis database; refuses to touch any other"""
+    r = redis_utils.get_redis_connection()
+    if r.connection_pool.connection_kwargs.get("db", 0) != settings.REDIS_TEST_DB:
+        raise ImproperlyConfigured("Run the tests with tripwhizz.test_runner.TestRunner")
+    r.flushdb()
@@ -0,0 +1,87 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from redis.exceptions import RedisError
+
+from user_account.models import Profile
+from user_account.redis_utils import get_redis_connection
+from user_account.suggestions import DIRTY_SUGGESTIONS_KEY, store_suggestions
+from user_account.tasks import refresh_friend_suggestions
+
+from .db_router import PRIMARY_DB, REPLICA_DB, ReplicaRoutingMiddleware, replica_configured, replica_reads
+from .test_runner import clear_redis
+
+# The runner sets up every alias a test class names, skipped or not
+TEST_DATABASES = {PRIMARY_DB, REPLICA_DB} if replica_configured() else {PRIMARY_DB}
+
+
+def queried_databases(func):
+    """Run ``func`` and return the aliases it sent queries to"""
+    with CaptureQueriesContext(connections[PRIMARY_DB]) as primary, \
+            CaptureQueriesContext(connections[REPLICA_DB]) as replica:
+        func()
+    return {alias for alias, queries in ((PRIMARY_DB, primary), (REPLICA_DB, replica)) if queries}
+
+
+def count_profiles(request):
+    Profile.objects.count()
+    return HttpResponse()
+
+
+@skipUnless(replica_configured(), "Set DB_REPLICA_HOST to run the replica routing tests")
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    databases = TEST_DATABASES
+
+    def test_reads_use_the_primary_by_default(self):
+        self.assertEqual(queried_databases(lambda: list(Profile.objects.all())), {PRIMARY_DB})
+
+    def test_replica_reads_route_reads_only(self):
+        def read():
+            with replica_reads():
+                list(Profile.objects.all())
+
+        def write():
+            with replica_reads():
+                Profile.objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+        self.assertEqual(queried_databases(read), {REPLICA_DB})
+        self.assertEqual(queried_databases(write), {PRIMARY_DB})
+
+    def test_friend_suggestion_refresh_reads_from_the_replica(self):
+        clear_redis()
+        ada = Profile.objects.create_user(username="ada", email="ada@example.com", password="pw")
+        r = get_redis_connection()
+        store_suggestions(r, ada.pk, [])
+        r.sadd(DIRTY_SUGGESTIONS_KEY, ada.pk)
+        self.assertEqual(queried_databases(refresh_friend_suggestions), {REPLICA_DB})
+
+
+@skipUnless(replica_configured(), "Set DB_REPLICA_HOST to run the replica routing tests")
+class ReplicaRoutingMiddlewareTests(TransactionTestCase):
+    databases = TEST_DATABASES
+
+    def setUp(self):
+        clear_redis()
+        self.middleware = ReplicaRoutingMiddleware(count_profiles)
+        self.factory = RequestFactory(HTTP_AUTHORIZATION="Token abc")
+
+    def handle(self, request):
+        request.user = AnonymousUser()
+        return queried_databases(lambda: self.middleware(request))
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self.handle(self.factory.get("/")), {REPLICA_DB})
+
+    def test_client_reads_its_own_writes_after_a_write(self):
+        self.assertEqual(self.handle(self.factory.post("/")), {PRIMARY_DB})
+        self.assertEqual(self.handle(self.factory.get("/")), {PRIMARY_DB})
+        # Other clients are not pinned
+        self.assertEqual(self.handle(RequestFactory(HTTP_AUTHORIZATION="Token xyz").get("/")), {REPLICA_DB})
+
+    def test_unknown_pin_state_stays_on_the_primary(self):
+        with mock.patch("user_account.redis_utils.get_redis_connection", side_effect=RedisError):
+            self.assertEqual(self.handle(self.factory.get("/")), {PRIMARY_DB})
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import serializers
+from redis.exceptions import RedisError
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+TOKEN_USER_KEY = "auth:token:{digest}"
+USER_TOKENS_KEY = "auth:user_tokens:{user_id}"
+
+
+def token_digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class LocalTokenCache:
+    """
+    Small per-process LRU of token digest -> (user id, serialized user, expiry),
+    guarded for threaded servers. Snapshots rather than instances are kept so
+    concurrent requests never share a mutable user object.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            _, snapshot, expires = entry
+            if expires < time.monotonic():
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+            return snapshot
+
+    def set(self, digest, user_id, snapshot):
+        with self.lock:
+            self.entries[digest] = (user_id, snapshot, time.monotonic() + settings.TOKEN_AUTH_LOCAL_CACHE_TTL)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > settings.TOKEN_AUTH_LOCAL_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def discard_user(self, user_id):
+        with self.lock:
+            for digest in [d for d, entry in self.entries.items() if entry[0] == user_id]:
+                del self.entries[digest]
+
+
+local_token_cache = LocalTokenCache()
+
+
+# Only these columns are cached; credentials and permission data never leave the database
+CACHED_USER_FIELDS = (
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "avatar",
+    "onboarding_complete",
+    "is_active",
+    "is_staff",
+    "date_joined",
+)
+
+
+def serialize_user(user):
+    return serializers.serialize("json", [user], fields=CACHED_USER_FIELDS)
+
+
+def deserialize_user(snapshot):
+    user = next(serializers.deserialize("json", snapshot)).object
+    user._state.adding = False
+    user._state.db = "default"
+    return user
+
+
+def invalidate_user_tokens(user_id):
+    """
+    Drop cached snapshots of a user after logout, password reset, deletion or
+    a profile change. Other processes' local caches expire within
+    TOKEN_AUTH_LOCAL_CACHE_TTL seconds.
+    """
+    local_token_cache.discard_user(user_id)
+    r = get_redis_connection()
+    index_key = USER_TOKENS_KEY.format(user_id=user_id)
+    try:
+        digests = r.smembers(index_key)
+        r.delete(index_key, *[TOKEN_USER_KEY.format(digest=digest) for digest in digests])
+    except RedisError:
+        logger.warning("Failed to invalidate cached tokens for user %s", user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication that keeps token -> user
+    snapshots in a per-process LRU and in Redis, so most requests skip the
+    Token/Profile query
+    """
+
+    def authenticate_credentials(self, key):
+        digest = token_digest(key)
+        snapshot = local_token_cache.get(digest) or self.get_cached_snapshot(digest)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            snapshot = serialize_user(user)
+            self.cache_snapshot(digest, user.pk, snapshot)
+            local_token_cache.set(digest, user.pk, snapshot)
+            return user, token
+
+        user = deserialize_user(snapshot)
+        local_token_cache.set(digest, user.pk, snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted.")
+        return user, Token(key=key, user=user)
+
+    def get_cached_snapshot(self, digest):
+        try:
+            return get_redis_connection().get(TOKEN_USER_KEY.format(digest=digest))
+        except RedisError:
+            return None
+
+    def cache_snapshot(self, digest, user_id, snapshot):
+        r = get_redis_connection()
+        ttl = settings.TOKEN_AUTH_CACHE_TTL
+        index_key = USER_TOKENS_KEY.format(user_id=user_id)
+        try:
+            pipe = r.pipeline()
+            pipe.set(TOKEN_USER_KEY.format(digest=digest), snapshot, ex=ttl)
+            pipe.sadd(index_key, digest)
+            pipe.expire(index_key, ttl)
+            pipe.execute()
+        except RedisError:
+            logger.warning("Failed to cache token for user %s", user_id)
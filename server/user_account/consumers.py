@@ -0,0 +1,39 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .realtime import user_group
+
+
+class PushConsumer(AsyncJsonWebsocketConsumer):
+    """Base consumer that forwards push.event messages from its groups to the client"""
+
+    async def get_groups(self):
+        return []
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        self.push_groups = await self.get_groups()
+        if self.push_groups is None:
+            await self.close(code=4003)
+            return
+
+        for group in self.push_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in getattr(self, "push_groups", None) or []:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def push_event(self, message):
+        await self.send_json({"type": message["event"], "payload": message["payload"]})
+
+
+class NotificationConsumer(PushConsumer):
+    """Per-user channel for notifications"""
+
+    async def get_groups(self):
+        return [user_group(self.scope["user"].id)]
@@ -0,0 +1,132 @@
+import logging
+import os
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .http import PooledSession
+
+logger = logging.getLogger(__name__)
+
+RESEND_API_URL = 'https://api.resend.com/emails'
+RESEND_BATCH_API_URL = 'https://api.resend.com/emails/batch'
+
+
+class EmailTransportError(Exception):
+    """Raised when the provider rejects or fails to accept a message.
+
+    ``retryable`` is False for errors that will not go away on their own
+    (bad payload, auth problems), so the message is dead-lettered right away.
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class ResendTransport:
+    """Delivers messages through the Resend HTTP API over a pooled session"""
+
+    http = PooledSession('EMAIL_HTTP_POOL_SIZE')
+
+    def __init__(self, api_key=None, api_url=None, batch_api_url=None, from_email=None):
+        self.api_key = api_key or os.getenv('RESEND_API_KEY')
+        self.api_url = api_url or getattr(settings, 'RESEND_API_URL', RESEND_API_URL)
+        self.batch_api_url = batch_api_url or getattr(settings, 'RESEND_BATCH_API_URL', RESEND_BATCH_API_URL)
+        self.from_email = from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', None)
+
+    def check_configured(self):
+        if not self.api_key or not self.from_email:
+            raise EmailTransportError(
+                'Resend not configured: missing RESEND_API_KEY or DEFAULT_FROM_EMAIL',
+                retryable=False,
+            )
+
+    def post(self, url, payload, headers=None):
+        try:
+            response = self.http.session().post(
+                url,
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'Content-Type': 'application/json',
+                    **(headers or {}),
+                },
+                json=payload,
+                timeout=settings.EMAIL_HTTP_TIMEOUT,
+            )
+        except requests.RequestException as ex:
+            raise EmailTransportError(f'Resend request failed: {ex}') from ex
+
+        if response.status_code >= 400:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise EmailTransportError(
+                f'Resend returned {response.status_code}: {response.text[:500]}',
+                retryable=retryable,
+            )
+        return response.json() or {}
+
+    def build_payload(self, email):
+        return {
+            'from': self.from_email,
+            'to': email.to,
+            'subject': email.subject,
+            'html': email.html_message,
+            **({'text': email.text_message} if email.text_message else {}),
+        }
+
+    def send(self, email):
+        """Send a single OutboundEmail and return the provider message id"""
+        self.check_configured()
+        return self.post(self.api_url, self.build_payload(email)).get('id', '')
+
+    def send_batch(self, emails):
+        """
+        Send up to EMAIL_BATCH_SIZE emails in a single request.
+        Returns a list aligned with ``emails`` holding either the provider
+        message id or the EmailTransportError for that message.
+        """
+        self.check_configured()
+        # Permissive validation lets valid messages through when others fail
+        body = self.post(
+            self.batch_api_url,
+            [self.build_payload(email) for email in emails],
+            headers={'x-batch-validation': 'permissive'},
+        )
+
+        results = [None] * len(emails)
+        for error in body.get('errors') or []:
+            index = error.get('index')
+            if index is not None and 0 <= index < len(emails):
+                results[index] = EmailTransportError(error.get('message', 'Rejected in batch'))
+
+        accepted = [i for i, result in enumerate(results) if result is None]
+        for index, item in zip(accepted, body.get('data') or []):
+            results[index] = item.get('id', '')
+
+        return [
+            result if result is not None else EmailTransportError('Missing from batch response')
+            for result in results
+        ]
+
+
+class LocMemTransport:
+    """Keeps sent messages in memory so tests can assert on them"""
+
+    outbox = []
+
+    def send(self, email):
+        self.outbox.append({
+            'to': list(email.to),
+            'subject': email.subject,
+            'html': email.html_message,
+            'text': email.text_message,
+        })
+        return f'locmem-{len(self.outbox)}'
+
+    def send_batch(self, emails):
+        return [self.send(email) for email in emails]
+
+
+def get_transport():
+    return import_string(settings.EMAIL_TRANSPORT)()
@@ -0,0 +1,244 @@
+import logging
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import BooleanField, Case, Exists, F, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Friendship
+from .redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+FRIEND_SET_KEY = 'friends:{user_id}'
+# Bumped on every change to a user's friendships; a rebuild only stores its set if this did not move
+FRIEND_SET_VERSION_KEY = 'friends:{user_id}:version'
+# Redis drops empty sets, so every cached set carries a placeholder member
+EMPTY_MEMBER = '0'
+
+# KEYS are (set, version) pairs. Bump each version, and only touch friend sets
+# that are already cached; a missing set is rebuilt from the database on read
+_UPDATE_IF_EXISTS = """
+local command = ARGV[1]
+local ttl = ARGV[2]
+for i = 1, #KEYS / 2 do
+    local set_key, version_key = KEYS[2 * i - 1], KEYS[2 * i]
+    redis.call('INCR', version_key)
+    redis.call('EXPIRE', version_key, ttl)
+    if redis.call('EXISTS', set_key) == 1 then
+        redis.call(command, set_key, ARGV[i + 2])
+    end
+end
+return #KEYS / 2
+"""
+
+# Store a rebuilt set unless a friendship changed since the rebuild read the
+# version (ARGV[1]); otherwise the rebuild may predate that change
+_STORE_IF_UNCHANGED = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV, 1000 do
+    redis.call('SADD', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def friend_set_key(user_id):
+    return FRIEND_SET_KEY.format(user_id=user_id)
+
+
+def friend_set_version_key(user_id):
+    return FRIEND_SET_VERSION_KEY.format(user_id=user_id)
+
+
+def query_friend_ids(user_id):
+    """Ids of everyone with an accepted friendship with ``user_id``, in one query"""
+    return set(
+        Friendship.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id), status='accepted')
+        .annotate(friend_id=Case(When(sender_id=user_id, then=F('receiver_id')), default=F('sender_id')))
+        .values_list('friend_id', flat=True)
+    )
+
+
+def get_friend_ids(user_id):
+    """
+    Return the set of friend ids for a user from the cached friend set,
+    rebuilding it from the database on a miss or when Redis is unavailable.
+    """
+    try:
+        r = get_redis_connection()
+        pipe = r.pipeline(transaction=False)
+        pipe.smembers(friend_set_key(user_id))
+        pipe.get(friend_set_version_key(user_id))
+        members, version = pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not read friend set', exc_info=True)
+        return query_friend_ids(user_id)
+
+    if members:
+        return {int(member) for member in members if member != EMPTY_MEMBER}
+
+    friend_ids = query_friend_ids(user_id)
+    store_friend_sets(r, {user_id: friend_ids}, {user_id: version})
+    return friend_ids
+
+
+def get_friend_id_sets(user_ids):
+    """
+    Return {user_id: friend ids} for several users with one pipelined read;
+    users without a cached set are loaded together in a single query.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    try:
+        r = get_redis_connection()
+        pipe = r.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.smembers(friend_set_key(user_id))
+            pipe.get(friend_set_version_key(user_id))
+        results = pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not read friend sets', exc_info=True)
+        r, results = None, [set(), None] * len(user_ids)
+
+    cached = dict(zip(user_ids, results[::2]))
+    versions = dict(zip(user_ids, results[1::2]))
+    friend_sets = {
+        user_id: {int(member) for member in members if member != EMPTY_MEMBER}
+        for user_id, members in cached.items() if members
+    }
+    missing = {user_id: set() for user_id in user_ids if user_id not in friend_sets}
+    if missing:
+        for sender_id, receiver_id in Friendship.objects.filter(
+            Q(sender_id__in=missing) | Q(receiver_id__in=missing), status='accepted'
+        ).values_list('sender_id', 'receiver_id'):
+            if sender_id in missing:
+                missing[sender_id].add(receiver_id)
+            if receiver_id in missing:
+                missing[receiver_id].add(sender_id)
+        if r is not None:
+            store_friend_sets(r, missing, versions)
+        friend_sets.update(missing)
+    return friend_sets
+
+
+def store_friend_sets(r, friend_sets, versions):
+    """
+    Cache rebuilt friend sets. ``versions`` holds each user's set version as
+    read before the database query; sets whose version moved are not stored.
+    """
+    try:
+        pipe = r.pipeline(transaction=False)
+        for user_id, friend_ids in friend_sets.items():
+            pipe.eval(
+                _STORE_IF_UNCHANGED, 2,
+                friend_set_key(user_id), friend_set_version_key(user_id),
+                versions.get(user_id) or '0', settings.FRIEND_SET_TTL, EMPTY_MEMBER, *friend_ids,
+            )
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not store friend sets', exc_info=True)
+
+
+def are_friends(user_id, other_id):
+    return other_id in get_friend_ids(user_id)
+
+
+def _update_friend_sets(command, user_id, other_id):
+    try:
+        get_redis_connection().eval(
+            _UPDATE_IF_EXISTS, 4,
+            friend_set_key(user_id), friend_set_version_key(user_id),
+            friend_set_key(other_id), friend_set_version_key(other_id),
+            command, settings.FRIEND_SET_TTL, other_id, user_id,
+        )
+    except redis.RedisError:
+        # A stale set would outlive this request, so drop both and let the next read rebuild them
+        logger.warning('Could not update friend sets', exc_info=True)
+        invalidate_friend_sets(user_id, other_id)
+
+
+def add_friendship(user_id, other_id):
+    _update_friend_sets('SADD', user_id, other_id)
+
+
+def remove_friendship(user_id, other_id):
+    _update_friend_sets('SREM', user_id, other_id)
+
+
+def sync_friendship(user_id, other_id):
+    """
+    Bring both cached friend sets in line with the database after a
+    friendship row between the two users changed, and return whether they
+    are friends. Rows in either direction count, so one row leaving
+    'accepted' does not end a friendship the opposite row still holds.
+    """
+    friends = Friendship.objects.filter(
+        Q(sender_id=user_id, receiver_id=other_id) | Q(sender_id=other_id, receiver_id=user_id),
+        status='accepted',
+    ).exists()
+    if friends:
+        add_friendship(user_id, other_id)
+    else:
+        remove_friendship(user_id, other_id)
+    return friends
+
+
+def invalidate_friend_sets(*user_ids):
+    try:
+        pipe = get_redis_connection().pipeline()
+        for user_id in user_ids:
+            pipe.delete(friend_set_key(user_id))
+            pipe.incr(friend_set_version_key(user_id))
+            pipe.expire(friend_set_version_key(user_id), settings.FRIEND_SET_TTL)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not invalidate friend sets', exc_info=True)
+
+
+# pg_trgm indexes only help once the pattern has a full trigram
+TRIGRAM_MIN_LENGTH = 3
+
+
+def search_users(user, query, limit):
+    """
+    Up to ``limit`` users matching ``query`` who are neither ``user`` nor
+    already their friends. Short queries only match name prefixes; longer
+    ones match substrings, with prefix matches first and the rest ranked by
+    trigram word similarity.
+    """
+    friendships = Friendship.objects.filter(
+        Q(sender_id=user.id, receiver_id=OuterRef('pk')) | Q(sender_id=OuterRef('pk'), receiver_id=user.id),
+        status='accepted',
+    )
+    users = User.objects.exclude(pk=user.pk).exclude(Exists(friendships)).select_related('preferences')
+    prefix = Q(username__istartswith=query) | Q(first_name__istartswith=query) | Q(last_name__istartswith=query)
+
+    if len(query) < TRIGRAM_MIN_LENGTH:
+        return users.filter(prefix).order_by('username')[:limit]
+
+    return (
+        users.filter(
+            Q(username__icontains=query) | Q(email__icontains=query)
+            | Q(first_name__icontains=query) | Q(last_name__icontains=query)
+        )
+        .annotate(
+            is_prefix=Case(When(prefix, then=Value(True)), default=Value(False), output_field=BooleanField()),
+            similarity=Greatest(
+                TrigramWordSimilarity(query, 'username'),
+                TrigramWordSimilarity(query, 'email'),
+                TrigramWordSimilarity(query, 'first_name'),
+                TrigramWordSimilarity(query, 'last_name'),
+            ),
+        )
+        .order_by('-is_prefix', '-similarity', 'username')[:limit]
+    )
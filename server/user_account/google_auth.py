@@ -0,0 +1,61 @@
+import hashlib
+import json
+import logging
+
+import requests
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .http import PooledSession
+from .redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+USERINFO_CACHE_KEY = "google:userinfo:{digest}"
+
+
+class GoogleAuthError(Exception):
+    """Raised when Google rejects the access token"""
+
+
+class GoogleUnavailableError(requests.HTTPError):
+    """Raised when Google answers with a server error or rate limit instead of a verdict on the token"""
+
+
+google_http = PooledSession("GOOGLE_HTTP_POOL_SIZE")
+
+
+def fetch_google_userinfo(access_token):
+    """
+    Return Google's userinfo for an access token. Verified responses are
+    cached for GOOGLE_USERINFO_CACHE_TTL seconds, keyed by a hash of the token,
+    so repeated logins with the same token skip the round trip. Raises
+    GoogleAuthError for rejected tokens, GoogleUnavailableError for 5xx and
+    429 answers and requests exceptions for other transport failures.
+    """
+    key = USERINFO_CACHE_KEY.format(digest=hashlib.sha256(access_token.encode()).hexdigest())
+    r = get_redis_connection()
+    try:
+        cached = r.get(key)
+    except RedisError:
+        cached = None
+        logger.warning("Google userinfo cache unavailable")
+    if cached is not None:
+        return json.loads(cached)
+
+    response = google_http.session().get(
+        settings.GOOGLE_RESPONSE_URL,
+        headers={"Authorization": f"Bearer {access_token}"},
+        timeout=settings.GOOGLE_HTTP_TIMEOUT,
+    )
+    if response.status_code >= 500 or response.status_code == 429:
+        raise GoogleUnavailableError(f"Google answered {response.status_code}", response=response)
+    userinfo = response.json()
+    if response.status_code >= 400 or "error" in userinfo:
+        raise GoogleAuthError(userinfo.get("error_description") or userinfo.get("error") or response.status_code)
+
+    try:
+        r.set(key, json.dumps(userinfo), ex=settings.GOOGLE_USERINFO_CACHE_TTL)
+    except RedisError:
+        logger.warning("Failed to cache Google userinfo")
+    return userinfo
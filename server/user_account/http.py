@@ -0,0 +1,30 @@
+import threading
+
+import requests
+from django.conf import settings
+
+
+class PooledSession:
+    """
+    Process-wide keep-alive requests.Session, created on first use with a
+    connection pool sized by the ``pool_size_setting`` Django setting
+    """
+
+    def __init__(self, pool_size_setting):
+        self.pool_size_setting = pool_size_setting
+        self._session = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=getattr(settings, self.pool_size_setting),
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from user_account.email_transport import ResendTransport
+from user_account.models import OutboundEmail
+
+
+class StubResendHandler(BaseHTTPRequestHandler):
+    latency = 0.02
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'null')
+        time.sleep(self.latency)
+
+        if self.path.endswith('/batch'):
+            body = {'data': [{'id': f'stub-{i}'} for i in range(len(payload))]}
+        else:
+            body = {'id': 'stub'}
+
+        encoded = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Compare single and batched email dispatch against a local stub of the Resend API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--latency', type=float, default=0.02, help='Simulated provider latency in seconds')
+
+    def handle(self, *args, **options):
+        StubResendHandler.latency = options['latency']
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubResendHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}/emails'
+
+        transport = ResendTransport(
+            api_key='benchmark',
+            api_url=base_url,
+            batch_api_url=f'{base_url}/batch',
+            from_email='benchmark@tripwhizz.local',
+        )
+        emails = [
+            OutboundEmail(
+                to=[f'invitee{i}@example.com'],
+                subject='You\'re invited to join "Benchmark trip" on TripWhizz!',
+                html_message='<p>Invitation</p>',
+            )
+            for i in range(options['count'])
+        ]
+
+        try:
+            start = time.perf_counter()
+            for email in emails:
+                transport.send(email)
+            single_elapsed = time.perf_counter() - start
+
+            batch_size = options['batch_size']
+            start = time.perf_counter()
+            for i in range(0, len(emails), batch_size):
+                transport.send_batch(emails[i:i + batch_size])
+            batch_elapsed = time.perf_counter() - start
+        finally:
+            server.shutdown()
+
+        count = len(emails)
+        self.stdout.write(f'Single sends: {count} emails in {single_elapsed:.2f}s ({count / single_elapsed:.0f}/s)')
+        self.stdout.write(f'Batched sends: {count} emails in {batch_elapsed:.2f}s ({count / batch_elapsed:.0f}/s)')
+        self.stdout.write(
+            self.style.SUCCESS(f'Batching is {single_elapsed / batch_elapsed:.1f}x faster')
+        )
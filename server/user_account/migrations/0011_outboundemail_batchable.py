@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_account", "0010_outboundemail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboundemail",
+            name="batchable",
+            field=models.BooleanField(default=False),
+        ),
+    ]
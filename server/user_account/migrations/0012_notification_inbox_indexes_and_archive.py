@@ -0,0 +1,97 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_account", "0011_outboundemail_batchable"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "notification_type",
+                    models.CharField(
+                        choices=[
+                            ("friend_request", "Friend Request"),
+                            ("friend_accept", "Friend Request Accepted"),
+                            ("trip_invite", "Trip Invitation"),
+                            ("trip_update", "Trip Update"),
+                            ("expense_update", "Expense Update"),
+                            ("document_added", "Document Added"),
+                            ("packing_added", "Packing Item Added"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("title", models.CharField(max_length=100)),
+                ("message", models.TextField()),
+                ("is_read", models.BooleanField(default=False)),
+                ("related_object_id", models.IntegerField(blank=True, null=True)),
+                ("created_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["-created_at", "-id"],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="notification",
+            options={"ordering": ["-created_at", "-id"]},
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "is_read", "created_at"],
+                name="notif_recipient_read_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "-created_at", "-id"],
+                name="notif_recipient_inbox_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationarchive",
+            name="recipient",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_notifications",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationarchive",
+            name="sender",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificationarchive",
+            index=models.Index(
+                fields=["recipient", "-created_at"], name="notif_archive_recipient_idx"
+            ),
+        ),
+    ]
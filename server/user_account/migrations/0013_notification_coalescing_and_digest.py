@@ -0,0 +1,125 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_account", "0012_notification_inbox_indexes_and_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="count",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="related_trip_id",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="notificationarchive",
+            name="count",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="notificationarchive",
+            name="related_trip_id",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="notification_type",
+            field=models.CharField(
+                choices=[
+                    ("friend_request", "Friend Request"),
+                    ("friend_accept", "Friend Request Accepted"),
+                    ("trip_invite", "Trip Invitation"),
+                    ("trip_update", "Trip Update"),
+                    ("expense_update", "Expense Update"),
+                    ("document_added", "Document Added"),
+                    ("packing_added", "Packing Item Added"),
+                    ("digest", "Digest"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notificationarchive",
+            name="notification_type",
+            field=models.CharField(
+                choices=[
+                    ("friend_request", "Friend Request"),
+                    ("friend_accept", "Friend Request Accepted"),
+                    ("trip_invite", "Trip Invitation"),
+                    ("trip_update", "Trip Update"),
+                    ("expense_update", "Expense Update"),
+                    ("document_added", "Document Added"),
+                    ("packing_added", "Packing Item Added"),
+                    ("digest", "Digest"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="PendingDigestNotification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "notification_type",
+                    models.CharField(
+                        choices=[
+                            ("friend_request", "Friend Request"),
+                            ("friend_accept", "Friend Request Accepted"),
+                            ("trip_invite", "Trip Invitation"),
+                            ("trip_update", "Trip Update"),
+                            ("expense_update", "Expense Update"),
+                            ("document_added", "Document Added"),
+                            ("packing_added", "Packing Item Added"),
+                            ("digest", "Digest"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("title", models.CharField(max_length=100)),
+                ("message", models.TextField()),
+                ("related_object_id", models.IntegerField(blank=True, null=True)),
+                ("related_trip_id", models.IntegerField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "recipient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pending_digest_notifications",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "sender",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created_at", "id"],
+            },
+        ),
+    ]
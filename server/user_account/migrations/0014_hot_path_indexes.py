@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_account", "0013_notification_coalescing_and_digest"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="friendship",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["receiver", "-created_at"],
+                name="friendship_pending_idx",
+            ),
+        ),
+    ]
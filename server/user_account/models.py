@@ -3,7 +3,9 @@ from datetime import timedelta
 from utils.upload_paths import upload_path
 
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 
@@ -11,11 +13,25 @@ class Profile(AbstractUser):
     avatar = models.ImageField(upload_to=upload_path, blank=True, null=True)
     onboarding_complete = models.BooleanField(default=False)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Substring search (UPPER(col) LIKE '%Q%') for queries of three or more characters
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='profile_username_trgm_idx'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='profile_email_trgm_idx'),
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='profile_first_name_trgm_idx'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='profile_last_name_trgm_idx'),
+            # Prefix search (UPPER(col) LIKE 'Q%') for queries too short to have trigrams
+            models.Index(OpClass(Upper('username'), name='text_pattern_ops'), name='profile_username_prefix_idx'),
+            models.Index(OpClass(Upper('first_name'), name='text_pattern_ops'), name='profile_first_name_prefix_idx'),
+            models.Index(OpClass(Upper('last_name'), name='text_pattern_ops'), name='profile_last_name_prefix_idx'),
+        ]
+
     def __str__(self):
         return self.username
 
 
 class PendingUser(models.Model):
+    # Unused since signup sessions moved to Redis (see redis_utils.start_signup_session)
     email = models.EmailField(unique=True)
     # Legacy columns password/otp kept in DB for existing migrations; avoid using them.
     password = models.CharField(max_length=128, blank=True, default="")
@@ -52,6 +68,11 @@ class Friendship(models.Model):
 
     class Meta:
         unique_together = ('sender', 'receiver')
+        indexes = [
+            # Incoming requests are the hot lookup and only a small fraction of rows are pending
+            models.Index(fields=['receiver', '-created_at'], condition=models.Q(status='pending'),
+                         name='friendship_pending_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.expires_at and self.status == 'pending':
@@ -74,6 +95,7 @@ class Notification(models.Model):
         ('expense_update', 'Expense Update'),
         ('document_added', 'Document Added'),
         ('packing_added', 'Packing Item Added'),
+        ('digest', 'Digest'),
     ]
 
     recipient = models.ForeignKey(Profile, related_name='notifications', on_delete=models.CASCADE)
@@ -85,15 +107,65 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     related_object_id = models.IntegerField(null=True,
                                             blank=True)
+    # Trip the event happened in; part of the coalescing key
+    related_trip_id = models.IntegerField(null=True, blank=True)
+    # Number of similar events folded into this row
+    count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='notif_recipient_read_idx'),
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notif_recipient_inbox_idx'),
+        ]
 
     def __str__(self):
         return f"{self.notification_type} for {self.recipient.username} from {self.sender.username if self.sender else 'System'}"
 
 
+class NotificationArchive(models.Model):
+    """Notifications past the retention window, moved out of the hot table by archive_old_notifications"""
+    recipient = models.ForeignKey(Profile, related_name='archived_notifications', on_delete=models.CASCADE)
+    sender = models.ForeignKey(Profile, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    related_object_id = models.IntegerField(null=True, blank=True)
+    related_trip_id = models.IntegerField(null=True, blank=True)
+    count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='notif_archive_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived {self.notification_type} for {self.recipient.username}"
+
+
+class PendingDigestNotification(models.Model):
+    """Non-urgent notification held back for a user in digest mode until send_notification_digests runs"""
+    recipient = models.ForeignKey(Profile, related_name='pending_digest_notifications', on_delete=models.CASCADE)
+    sender = models.ForeignKey(Profile, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    related_object_id = models.IntegerField(null=True, blank=True)
+    related_trip_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        return f"Pending digest {self.notification_type} for {self.recipient.username}"
+
+
 class UserPreferences(models.Model):
     user = models.OneToOneField(Profile, related_name="preferences", on_delete=models.CASCADE)
     data = models.JSONField(default=dict, blank=True)
@@ -102,3 +174,34 @@ class UserPreferences(models.Model):
 
     def __str__(self):
         return f"Preferences for {self.user.username}"
+
+
+class OutboundEmail(models.Model):
+    """Queued transactional email, delivered by the send_outbound_email task"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('dead', 'Dead'),
+    ]
+
+    to = models.JSONField(default=list)
+    subject = models.CharField(max_length=255)
+    html_message = models.TextField()
+    text_message = models.TextField(blank=True, default="")
+    # Batchable messages wait for dispatch_outbound_email_batches instead of being sent on their own
+    batchable = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    provider_message_id = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
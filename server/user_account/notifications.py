@@ -0,0 +1,165 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification, PendingDigestNotification, UserPreferences
+from .realtime import publish_to_user
+from .redis_utils import adjust_unread_counts
+
+# Bursty, non-urgent types: coalesced into one row and eligible for digests
+COALESCE_TYPES = {'packing_added', 'document_added', 'expense_update'}
+DIGEST_TYPES = COALESCE_TYPES
+DIGEST_FREQUENCIES = {'hourly', 'daily'}
+
+
+def is_opted_out(preferences_data, preference_key):
+    """Users opt out of a notification kind by setting notifications.<key> to False"""
+    cfg = (preferences_data or {}).get('notifications', {})
+    return cfg.get(preference_key) is False
+
+
+def serialize_event(event):
+    """Make an event JSON-safe for Celery by replacing ``sender`` with ``sender_id``"""
+    event = dict(event)
+    sender = event.pop('sender', None)
+    if sender is not None:
+        event['sender_id'] = sender.pk
+    return event
+
+
+def publish_notification(notification, event_type='notification.created'):
+    publish_to_user(notification.recipient_id, event_type, {
+        'id': notification.id,
+        'sender_id': notification.sender_id,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'related_object_id': notification.related_object_id,
+        'count': notification.count,
+        'created_at': notification.created_at.isoformat(),
+    })
+
+
+def coalesce_notifications(recipient_ids, event):
+    """
+    Fold ``event`` into unread notifications with the same recipient, type,
+    trip and sender created within NOTIFICATION_COALESCE_WINDOW seconds.
+    Returns the recipient ids that had no such notification.
+    """
+    since = timezone.now() - timezone.timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW)
+    existing = {}
+    for notification in Notification.objects.filter(
+        recipient_id__in=recipient_ids,
+        notification_type=event['notification_type'],
+        related_trip_id=event.get('trip_id'),
+        sender_id=event.get('sender_id'),
+        is_read=False,
+        created_at__gte=since,
+    ).order_by('recipient_id', '-created_at'):
+        existing.setdefault(notification.recipient_id, notification)
+
+    if existing:
+        Notification.objects.filter(id__in=[n.id for n in existing.values()]).update(
+            count=F('count') + 1,
+            title=event['title'],
+            message=event['message'],
+            related_object_id=event.get('related_object_id'),
+        )
+        for notification in existing.values():
+            notification.count += 1
+            notification.title = event['title']
+            notification.message = event['message']
+            notification.related_object_id = event.get('related_object_id')
+            publish_notification(notification, 'notification.updated')
+
+    return [user_id for user_id in recipient_ids if user_id not in existing]
+
+
+def create_notifications(recipient_ids, event):
+    """
+    Create one notification per recipient for ``event`` with a single insert.
+
+    ``event`` is a dict with ``notification_type``, ``title`` and ``message``,
+    plus optional ``sender_id``, ``related_object_id``, ``trip_id`` and
+    ``preference_key``. When ``preference_key`` is set, recipients who opted
+    out of it are skipped. Non-urgent types are held for recipients in digest
+    mode and coalesced into recent unread rows for everyone else. Recipient
+    preferences are loaded in one query.
+    """
+    recipient_ids = list(dict.fromkeys(recipient_ids))
+    if not recipient_ids:
+        return []
+
+    preference_key = event.get('preference_key')
+    is_digest_type = event['notification_type'] in DIGEST_TYPES
+    if preference_key or is_digest_type:
+        preferences = dict(
+            UserPreferences.objects.filter(user_id__in=recipient_ids).values_list('user_id', 'data')
+        )
+        if preference_key:
+            recipient_ids = [
+                user_id for user_id in recipient_ids
+                if not is_opted_out(preferences.get(user_id), preference_key)
+            ]
+        if is_digest_type:
+            digest_ids = {user_id for user_id in recipient_ids if get_digest_frequency(preferences.get(user_id))}
+            hold_for_digest(digest_ids, event)
+            recipient_ids = [user_id for user_id in recipient_ids if user_id not in digest_ids]
+
+    if recipient_ids and event['notification_type'] in COALESCE_TYPES:
+        recipient_ids = coalesce_notifications(recipient_ids, event)
+
+    notifications = [
+        Notification(
+            recipient_id=user_id,
+            sender_id=event.get('sender_id'),
+            notification_type=event['notification_type'],
+            title=event['title'],
+            message=event['message'],
+            related_object_id=event.get('related_object_id'),
+            related_trip_id=event.get('trip_id'),
+        )
+        for user_id in recipient_ids
+    ]
+    created = Notification.objects.bulk_create(notifications)
+    adjust_unread_counts(Counter(notification.recipient_id for notification in created))
+    for notification in created:
+        publish_notification(notification)
+    return created
+
+
+def get_digest_frequency(preferences_data):
+    """Digest mode is enabled with notifications.digest set to 'hourly' or 'daily'"""
+    frequency = (preferences_data or {}).get('notifications', {}).get('digest')
+    return frequency if frequency in DIGEST_FREQUENCIES else None
+
+
+def hold_for_digest(recipient_ids, event):
+    return PendingDigestNotification.objects.bulk_create([
+        PendingDigestNotification(
+            recipient_id=user_id,
+            sender_id=event.get('sender_id'),
+            notification_type=event['notification_type'],
+            title=event['title'],
+            message=event['message'],
+            related_object_id=event.get('related_object_id'),
+            related_trip_id=event.get('trip_id'),
+        )
+        for user_id in recipient_ids
+    ])
+
+
+def notify_users(recipient_ids, event):
+    """
+    Queue notifications for ``recipient_ids``. ``event`` may carry a
+    ``sender`` user; see create_notifications for the other keys. The
+    fan-out runs in Celery once the current transaction commits.
+    """
+    from .tasks import fan_out_notifications
+
+    recipient_ids = list(recipient_ids)
+    payload = serialize_event(event)
+    transaction.on_commit(lambda: fan_out_notifications.delay(recipient_ids, payload))
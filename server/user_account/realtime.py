@@ -0,0 +1,48 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    return f"user.{user_id}"
+
+
+def trip_group(trip_id):
+    return f"trip.{trip_id}"
+
+
+def group_send(group, message):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group, message)
+    except Exception:
+        logger.warning("Could not send %s to %s", message["type"], group, exc_info=True)
+
+
+def publish(group, event_type, payload):
+    """
+    Push an event to every websocket in ``group``. Delivery is best effort:
+    clients resync over HTTP when they reconnect, so failures are only logged.
+    """
+    group_send(group, {"type": "push.event", "event": event_type, "payload": payload})
+
+
+def publish_to_user(user_id, event_type, payload):
+    publish(user_group(user_id), event_type, payload)
+
+
+def publish_to_trip(trip_id, event_type, payload):
+    publish(trip_group(trip_id), event_type, payload)
+
+
+def revoke_trip_access(trip_id, user_ids=None):
+    """
+    Make the trip's websockets re-check membership and close for users who
+    left. ``user_ids`` limits the check to those users; None checks everyone.
+    """
+    group_send(trip_group(trip_id), {"type": "membership.changed", "user_ids": user_ids})
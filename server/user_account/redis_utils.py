@@ -1,48 +1,226 @@
-import time
+import logging
+import os
+import threading
+from urllib.parse import urlsplit
 from django.conf import settings
 import redis
 
-# Create a Redis connection pool
-if not settings.REDIS_USE_URL:
-    redis_pool = redis.ConnectionPool(
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+# Database number overriding the configured one, set by the test runner
+_database = None
+
+
+def create_connection_pool(db=None):
+    options = {
+        "decode_responses": True,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "socket_connect_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+    }
+    if settings.REDIS_USE_URL or not getattr(settings, "REDIS_HOST", None):
+        url = settings.REDIS_URL
+        if db is not None:
+            url = urlsplit(url)._replace(path=f"/{db}").geturl()
+        return redis.ConnectionPool.from_url(url, **options)
+    return redis.ConnectionPool(
         host=settings.REDIS_HOST,
         port=int(settings.REDIS_PORT),
-        db=int(settings.REDIS_DB),
+        db=int(settings.REDIS_DB if db is None else db),
         password=settings.REDIS_PASSWORD or None,
-        decode_responses=True
+        **options,
     )
 
 
 def get_redis_connection():
-    """Get a Redis connection from the pool"""
-    return redis.Redis(connection_pool=redis_pool) if not settings.REDIS_USE_URL else redis.Redis.from_url(settings.REDIS_URL)
+    """
+    Process-wide Redis client backed by one bounded connection pool. It is
+    created on first use and again in a forked child (gunicorn and Celery
+    prefork workers), so sockets are never shared across processes.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = redis.Redis(connection_pool=create_connection_pool(_database))
+                _client_pid = pid
+    return _client
+
+
+def use_database(db):
+    """Point get_redis_connection at another database number; None restores the configured one"""
+    global _client, _database
+    with _client_lock:
+        _database = db
+        _client = None
+
+
+# Unread notification counters
+UNREAD_COUNT_KEY = "notifications:unread:{user_id}"
+# Bumped on every counter adjustment; a rebuild only stores its count if this did not move
+UNREAD_COUNT_VERSION_KEY = "notifications:unread_version:{user_id}"
+
+# KEYS are (counter, version) pairs. Bump each version, and only adjust counters
+# that already exist; a missing key is rebuilt from the database on read
+_ADJUST_IF_EXISTS = """
+local ttl = ARGV[1]
+for i = 1, #KEYS / 2 do
+    local key, version_key = KEYS[2 * i - 1], KEYS[2 * i]
+    redis.call('INCR', version_key)
+    redis.call('EXPIRE', version_key, ttl)
+    if redis.call('EXISTS', key) == 1 then
+        local value = redis.call('INCRBY', key, ARGV[i + 1])
+        if value < 0 then
+            redis.call('SET', key, 0, 'KEEPTTL')
+        end
+    end
+end
+return #KEYS / 2
+"""
 
+# Store a rebuilt counter unless one exists already or the count changed since
+# the rebuild read the version (ARGV[1]); otherwise the rebuild may predate it
+_STORE_IF_UNCHANGED = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3], 'NX') and 1 or 0
+"""
 
-# Rate limiting for friend requests
-def check_friend_request_rate_limit(user_id):
+
+def unread_count_key(user_id):
+    return UNREAD_COUNT_KEY.format(user_id=user_id)
+
+
+def unread_count_version_key(user_id):
+    return UNREAD_COUNT_VERSION_KEY.format(user_id=user_id)
+
+
+def adjust_unread_counts(deltas):
     """
-    Check if a user has exceeded the rate limit for friend requests
-    Returns (allowed, current_count, reset_time)
+    Apply {user_id: delta} to the cached unread counters in one round trip.
+    Failures are logged and ignored; reconciliation repairs any drift.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    try:
+        r = get_redis_connection()
+        r.eval(
+            _ADJUST_IF_EXISTS,
+            2 * len(deltas),
+            *[key for user_id in deltas for key in (unread_count_key(user_id), unread_count_version_key(user_id))],
+            settings.NOTIFICATION_UNREAD_COUNT_TTL,
+            *deltas.values(),
+        )
+    except redis.RedisError:
+        logger.warning("Could not update unread notification counters", exc_info=True)
+
+
+def set_unread_count(user_id, count):
+    try:
+        get_redis_connection().set(
+            unread_count_key(user_id), count, ex=settings.NOTIFICATION_UNREAD_COUNT_TTL
+        )
+    except redis.RedisError:
+        logger.warning("Could not store unread notification counter", exc_info=True)
+
+
+def get_unread_count(user_id, rebuild):
     """
+    Return the cached unread count for a user. On a cache miss (or when Redis
+    is unavailable) ``rebuild()`` computes it from the database and the
+    result is stored for the next read.
+    """
+    try:
+        r = get_redis_connection()
+        value, version = r.mget(unread_count_key(user_id), unread_count_version_key(user_id))
+    except redis.RedisError:
+        logger.warning("Could not read unread notification counter", exc_info=True)
+        return rebuild()
+
+    if value is not None:
+        return int(value)
+
+    count = rebuild()
+    try:
+        r.eval(
+            _STORE_IF_UNCHANGED, 2,
+            unread_count_key(user_id), unread_count_version_key(user_id),
+            version or "0", count, settings.NOTIFICATION_UNREAD_COUNT_TTL,
+        )
+    except redis.RedisError:
+        logger.warning("Could not store unread notification counter", exc_info=True)
+    return count
+
+
+def scan_unread_count_user_ids():
     r = get_redis_connection()
-    key = f"rate:friend_request:{user_id}"
-    max_requests = settings.FRIEND_REQUEST_RATE_LIMIT["max_requests"]
-    time_window = settings.FRIEND_REQUEST_RATE_LIMIT["time_window"]
-
-    # Get current count and TTL
-    count = r.get(key)
-    if count is None:
-        # First request in the time window
-        r.setex(key, time_window, 1)
-        return True, 1, int(time.time()) + time_window
-
-    count = int(count)
-    ttl = r.ttl(key)
-
-    if count >= max_requests:
-        # Rate limit exceeded
-        return False, count, int(time.time()) + ttl
-
-    # Increment the counter
-    r.incr(key)
-    return True, count + 1, int(time.time()) + ttl
+    prefix = UNREAD_COUNT_KEY.format(user_id="")
+    for key in r.scan_iter(match=f"{prefix}*", count=500):
+        yield int(key[len(prefix):])
+
+
+# Signup sessions: one hash per email holding the OTP and the hashed password
+SIGNUP_SESSION_KEY = "signup:{email}"
+
+# Replace the OTP only if the session still exists, and restart its TTL
+_REFRESH_SIGNUP_OTP = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'otp', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# Read and delete the session in one step, but only when the OTP matches.
+# Returns nil for no session, {0} for a wrong code, {1, password} on success.
+_CONSUME_SIGNUP_SESSION = """
+local otp = redis.call('HGET', KEYS[1], 'otp')
+if not otp then
+    return nil
+end
+if otp ~= ARGV[1] then
+    return {0}
+end
+local password = redis.call('HGET', KEYS[1], 'password')
+redis.call('DEL', KEYS[1])
+return {1, password}
+"""
+
+
+def signup_session_key(email):
+    return SIGNUP_SESSION_KEY.format(email=email)
+
+
+def start_signup_session(email, otp_code, password_hash):
+    key = signup_session_key(email)
+    pipe = get_redis_connection().pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping={"otp": otp_code, "password": password_hash})
+    pipe.expire(key, settings.SIGNUP_SESSION_TTL)
+    pipe.execute()
+
+
+def refresh_signup_otp(email, otp_code):
+    """Return False if there is no pending signup for this email"""
+    return bool(get_redis_connection().eval(
+        _REFRESH_SIGNUP_OTP, 1, signup_session_key(email), otp_code, settings.SIGNUP_SESSION_TTL
+    ))
+
+
+def consume_signup_session(email, otp_code):
+    """
+    Return (found, password_hash). found is False when there is no pending
+    signup; password_hash is None when the code is wrong.
+    """
+    result = get_redis_connection().eval(_CONSUME_SIGNUP_SESSION, 1, signup_session_key(email), str(otp_code))
+    if result is None:
+        return False, None
+    return True, (result[1] if result[0] == 1 else None)
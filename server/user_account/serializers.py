@@ -2,10 +2,26 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.db import models
 from .models import Friendship, Notification, UserPreferences
+from .notifications import notify_users
 
 User = get_user_model()
 
 
+def visible_avatar_url(user, request=None):
+    """Avatar URL for ``user``, or None if they hid their profile"""
+    try:
+        if user.preferences.data.get('privacy', {}).get('profile_visible', True) is False:
+            return None
+    except UserPreferences.DoesNotExist:
+        pass
+
+    if user.avatar and hasattr(user.avatar, 'url'):
+        if request:
+            return request.build_absolute_uri(user.avatar.url)
+        return user.avatar.url
+    return None
+
+
 class UserSerializer(serializers.ModelSerializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
@@ -31,20 +47,7 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def get_avatar_url(self, obj):
-        try:
-            prefs = obj.preferences
-            visible = prefs.data.get('privacy', {}).get('profile_visible', True)
-            if visible is False:
-                return None
-        except UserPreferences.DoesNotExist:
-            pass
-
-        if obj.avatar and hasattr(obj.avatar, 'url'):
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
-        return None
+        return visible_avatar_url(obj, self.context.get('request'))
 
     def create(self, validated_data):
         username = validated_data["email"]
@@ -102,14 +105,13 @@ class FriendshipSerializer(serializers.ModelSerializer):
                     existing.save()
 
                     # Create notification for the original sender
-                    Notification.objects.create(
-                        recipient=existing.sender,
-                        sender=existing.receiver,
-                        notification_type='friend_accept',
-                        title='Friend Request Accepted',
-                        message=f'{existing.receiver.username} accepted your friend request',
-                        related_object_id=existing.id
-                    )
+                    notify_users([existing.sender_id], {
+                        'sender': existing.receiver,
+                        'notification_type': 'friend_accept',
+                        'title': 'Friend Request Accepted',
+                        'message': f'{existing.receiver.username} accepted your friend request',
+                        'related_object_id': existing.id,
+                    })
 
                     return existing
             elif existing.status == 'rejected':
@@ -120,14 +122,13 @@ class FriendshipSerializer(serializers.ModelSerializer):
                 existing.save()
 
                 # Create notification for the receiver
-                Notification.objects.create(
-                    recipient=receiver,
-                    sender=sender,
-                    notification_type='friend_request',
-                    title='New Friend Request',
-                    message=f'{sender.username} sent you a friend request',
-                    related_object_id=existing.id
-                )
+                notify_users([receiver.id], {
+                    'sender': sender,
+                    'notification_type': 'friend_request',
+                    'title': 'New Friend Request',
+                    'message': f'{sender.username} sent you a friend request',
+                    'related_object_id': existing.id,
+                })
 
                 return existing
 
@@ -135,14 +136,13 @@ class FriendshipSerializer(serializers.ModelSerializer):
         friendship = Friendship.objects.create(sender=sender, receiver=receiver, status='pending')
 
         # Create notification for the receiver
-        Notification.objects.create(
-            recipient=receiver,
-            sender=sender,
-            notification_type='friend_request',
-            title='New Friend Request',
-            message=f'{sender.username} sent you a friend request',
-            related_object_id=friendship.id
-        )
+        notify_users([receiver.id], {
+            'sender': sender,
+            'notification_type': 'friend_request',
+            'title': 'New Friend Request',
+            'message': f'{sender.username} sent you a friend request',
+            'related_object_id': friendship.id,
+        })
 
         return friendship
 
@@ -156,29 +156,35 @@ class FriendListSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'first_name', 'last_name', 'email', 'avatar_url']
 
     def get_avatar_url(self, obj):
-        try:
-            prefs = obj.preferences
-            visible = prefs.data.get('privacy', {}).get('profile_visible', True)
-            if visible is False:
-                return None
-        except UserPreferences.DoesNotExist:
-            pass
+        return visible_avatar_url(obj, self.context.get('request'))
+
+
+class FriendSuggestionSerializer(serializers.Serializer):
+    """A suggested user with the connections behind the suggestion"""
+    user = FriendListSerializer()
+    mutual_friends = serializers.IntegerField()
+    shared_trips = serializers.IntegerField()
 
-        if obj.avatar and hasattr(obj.avatar, 'url'):
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
-        return None
+
+class NotificationSenderSerializer(serializers.ModelSerializer):
+    """Minimal sender representation for notification lists"""
+    avatar_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'avatar_url']
+
+    def get_avatar_url(self, obj):
+        return visible_avatar_url(obj, self.context.get('request'))
 
 
 class NotificationSerializer(serializers.ModelSerializer):
-    sender = UserSerializer(read_only=True)
+    sender = NotificationSenderSerializer(read_only=True)
 
     class Meta:
         model = Notification
-        fields = ['id', 'sender', 'notification_type', 'title', 'message', 'is_read', 'related_object_id', 'created_at']
-        read_only_fields = ['id', 'sender', 'notification_type', 'title', 'message', 'related_object_id', 'created_at']
+        fields = ['id', 'sender', 'notification_type', 'title', 'message', 'is_read', 'related_object_id', 'count', 'created_at']
+        read_only_fields = ['id', 'sender', 'notification_type', 'title', 'message', 'related_object_id', 'count', 'created_at']
 
 
 class LoginSerializer(serializers.Serializer):
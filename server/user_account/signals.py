@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .friends import sync_friendship
+from .models import Friendship
+from .suggestions import friendship_changed, mark_suggestions_dirty
+
+
+@receiver(post_save, sender=Friendship)
+def friendship_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    accepted = instance.status == 'accepted'
+
+    def on_commit():
+        sync_friendship(instance.sender_id, instance.receiver_id)
+        if accepted:
+            friendship_changed(instance.sender_id, instance.receiver_id)
+        else:
+            mark_suggestions_dirty([instance.sender_id, instance.receiver_id])
+
+    transaction.on_commit(on_commit)
+
+
+@receiver(post_delete, sender=Friendship)
+def friendship_deleted(sender, instance, **kwargs):
+    def on_commit():
+        sync_friendship(instance.sender_id, instance.receiver_id)
+        friendship_changed(instance.sender_id, instance.receiver_id)
+
+    transaction.on_commit(on_commit)
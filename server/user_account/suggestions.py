@@ -0,0 +1,121 @@
+import json
+import logging
+from collections import Counter
+
+import redis
+from django.conf import settings
+from django.db.models import Count, Q
+
+from trip.models import Trip
+
+from .friends import get_friend_id_sets, get_friend_ids
+from .models import Friendship
+from .redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+# Ranked [user_id, mutual_friends, shared_trips] rows, written by the refresh job
+SUGGESTIONS_KEY = 'friend_suggestions:{user_id}'
+# Users whose suggestions are stale and should be recomputed by the next refresh
+DIRTY_SUGGESTIONS_KEY = 'friend_suggestions:dirty'
+
+TripParticipant = Trip.participants.through
+
+
+def suggestions_key(user_id):
+    return SUGGESTIONS_KEY.format(user_id=user_id)
+
+
+def count_shared_trips(user_id):
+    """{user_id: number of trips shared with ``user_id``} in one query"""
+    user_trips = TripParticipant.objects.filter(profile_id=user_id).values('trip_id')
+    return dict(
+        TripParticipant.objects.filter(trip_id__in=user_trips)
+        .exclude(profile_id=user_id)
+        .values('profile_id')
+        .annotate(trips=Count('trip_id', distinct=True))
+        .values_list('profile_id', 'trips')
+    )
+
+
+def pending_request_user_ids(user_id):
+    pending = Friendship.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id), status='pending')
+    return {other for pair in pending.values_list('sender_id', 'receiver_id') for other in pair} - {user_id}
+
+
+def compute_suggestions(user_id):
+    """
+    Rank friends-of-friends and co-travellers of ``user_id`` by mutual
+    friends plus shared trips, skipping existing friends and anyone with a
+    pending request either way.
+    """
+    friend_ids = get_friend_ids(user_id)
+    mutual_friends = Counter()
+    for friends_of_friend in get_friend_id_sets(friend_ids).values():
+        mutual_friends.update(friends_of_friend)
+    shared_trips = count_shared_trips(user_id)
+
+    candidates = (mutual_friends.keys() | shared_trips.keys()) - friend_ids - pending_request_user_ids(user_id)
+    candidates.discard(user_id)
+    ranked = sorted(
+        candidates,
+        key=lambda candidate: (
+            -(mutual_friends[candidate] + shared_trips.get(candidate, 0)),
+            -mutual_friends[candidate],
+            candidate,
+        ),
+    )
+    return [
+        [candidate, mutual_friends[candidate], shared_trips.get(candidate, 0)]
+        for candidate in ranked[:settings.FRIEND_SUGGESTION_LIMIT]
+    ]
+
+
+def store_suggestions(r, user_id, suggestions):
+    r.set(suggestions_key(user_id), json.dumps(suggestions), ex=settings.FRIEND_SUGGESTION_TTL)
+
+
+def get_suggestions(user_id):
+    """
+    Return the cached suggestions for a user, computing them on a miss.
+    People who became friends since the last refresh are dropped on read.
+    """
+    try:
+        r = get_redis_connection()
+        cached = r.get(suggestions_key(user_id))
+    except redis.RedisError:
+        logger.warning('Could not read friend suggestions', exc_info=True)
+        return compute_suggestions(user_id)
+
+    if cached is not None:
+        friend_ids = get_friend_ids(user_id)
+        return [row for row in json.loads(cached) if row[0] not in friend_ids]
+
+    suggestions = compute_suggestions(user_id)
+    try:
+        store_suggestions(r, user_id, suggestions)
+    except redis.RedisError:
+        logger.warning('Could not store friend suggestions', exc_info=True)
+    return suggestions
+
+
+def mark_suggestions_dirty(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    try:
+        get_redis_connection().sadd(DIRTY_SUGGESTIONS_KEY, *user_ids)
+    except redis.RedisError:
+        logger.warning('Could not mark friend suggestions for refresh', exc_info=True)
+
+
+def friendship_changed(user_id, other_id):
+    """Both users and everyone adjacent to them gain or lose a friend-of-friend"""
+    friend_sets = get_friend_id_sets([user_id, other_id])
+    mark_suggestions_dirty({user_id, other_id}.union(*friend_sets.values()))
+
+
+def trips_changed(trip_ids, user_ids=()):
+    """Everyone on the trips (and anyone who just left them) has new co-travellers"""
+    participants = TripParticipant.objects.filter(trip_id__in=trip_ids).values_list('profile_id', flat=True)
+    mark_suggestions_dirty(set(participants) | set(user_ids))
@@ -0,0 +1,349 @@
+import logging
+from collections import Counter
+
+import redis
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from tripwhizz.db_router import use_replica
+
+from .email_transport import EmailTransportError, get_transport
+from .models import (
+    Notification,
+    NotificationArchive,
+    OutboundEmail,
+    PendingDigestNotification,
+    UserPreferences,
+)
+from .notifications import create_notifications, get_digest_frequency, publish_notification
+from .redis_utils import (
+    adjust_unread_counts,
+    get_redis_connection,
+    scan_unread_count_user_ids,
+    unread_count_key,
+)
+from .suggestions import DIRTY_SUGGESTIONS_KEY, compute_suggestions, store_suggestions, suggestions_key
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=None)
+def send_outbound_email(self, email_id):
+    """
+    Deliver a queued email, retrying with exponential backoff and
+    dead-lettering it once EMAIL_MAX_RETRIES attempts have failed
+    """
+    # Claim the row so a duplicate delivery of this task cannot send twice
+    claimed = OutboundEmail.objects.filter(
+        pk=email_id, status__in=['pending', 'failed']
+    ).update(status='sending', updated_at=timezone.now())
+    if not claimed:
+        return None
+
+    email = OutboundEmail.objects.get(pk=email_id)
+    email.attempts += 1
+    try:
+        provider_id = get_transport().send(email)
+    except EmailTransportError as ex:
+        email.last_error = str(ex)
+        if not ex.retryable or email.attempts >= settings.EMAIL_MAX_RETRIES:
+            email.status = 'dead'
+            email.save(update_fields=['attempts', 'last_error', 'status', 'updated_at'])
+            logger.error('Email %s dead-lettered after %s attempts: %s', email.id, email.attempts, ex)
+            return email.status
+
+        email.status = 'failed'
+        email.save(update_fields=['attempts', 'last_error', 'status', 'updated_at'])
+        countdown = settings.EMAIL_RETRY_BACKOFF * (2 ** (email.attempts - 1))
+        raise self.retry(countdown=countdown, exc=ex)
+
+    email.status = 'sent'
+    email.provider_message_id = provider_id or ''
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    email.save(update_fields=['attempts', 'status', 'provider_message_id', 'sent_at', 'last_error', 'updated_at'])
+    return email.status
+
+
+def release_expired_claims(batchable):
+    """
+    Put emails whose worker died mid-delivery back in the queue. An expired
+    claim counts as an attempt, so a message that keeps killing its worker
+    is dead-lettered instead of looping. Returns the ids that can be retried.
+    """
+    now = timezone.now()
+    cutoff = now - timezone.timedelta(seconds=settings.EMAIL_SENDING_LEASE)
+    with transaction.atomic():
+        expired = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='sending', batchable=batchable, updated_at__lt=cutoff)
+        )
+        for email in expired:
+            email.attempts += 1
+            email.last_error = 'Delivery lease expired'
+            email.updated_at = now
+            if email.attempts >= settings.EMAIL_MAX_RETRIES:
+                email.status = 'dead'
+                logger.error('Email %s dead-lettered after %s attempts: lease expired', email.id, email.attempts)
+            else:
+                email.status = 'pending'
+        OutboundEmail.objects.bulk_update(expired, ['attempts', 'last_error', 'status', 'updated_at'])
+    return [email.id for email in expired if email.status == 'pending']
+
+
+@shared_task
+def requeue_stale_outbound_emails():
+    """
+    Re-enqueue emails whose task never ran, e.g. because the broker was down
+    when the request committed, or whose worker died while sending
+    """
+    released_ids = release_expired_claims(batchable=False)
+    cutoff = timezone.now() - timezone.timedelta(seconds=settings.EMAIL_STALE_AFTER)
+    stale = OutboundEmail.objects.filter(status='pending', batchable=False, updated_at__lt=cutoff)
+    stale_ids = released_ids + list(stale.values_list('id', flat=True))
+    OutboundEmail.objects.filter(id__in=stale_ids).update(updated_at=timezone.now())
+    for email_id in stale_ids:
+        send_outbound_email.delay(email_id)
+    return len(stale_ids)
+
+
+def claim_email_batch(batch_size):
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', batchable=True)
+            .order_by('created_at')[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=[email.id for email in emails]).update(
+            status='sending', updated_at=timezone.now()
+        )
+    return emails
+
+
+def deliver_email_batch(transport, emails):
+    """
+    Send a claimed batch and record the outcome per message. Messages the
+    provider did not accept fall back to individual delivery, which owns
+    retries and dead-lettering.
+    """
+    try:
+        results = transport.send_batch(emails)
+    except EmailTransportError as ex:
+        results = [ex] * len(emails)
+
+    now = timezone.now()
+    fallback_ids = []
+    for email, result in zip(emails, results):
+        email.attempts += 1
+        email.updated_at = now
+        if isinstance(result, EmailTransportError):
+            email.status = 'failed'
+            email.last_error = str(result)
+            fallback_ids.append(email.id)
+        else:
+            email.status = 'sent'
+            email.provider_message_id = result or ''
+            email.sent_at = now
+            email.last_error = ''
+
+    OutboundEmail.objects.bulk_update(
+        emails, ['attempts', 'status', 'provider_message_id', 'sent_at', 'last_error', 'updated_at']
+    )
+    for email_id in fallback_ids:
+        send_outbound_email.delay(email_id)
+    return len(emails) - len(fallback_ids), len(fallback_ids)
+
+
+@shared_task
+def dispatch_outbound_email_batches():
+    """
+    Group pending batchable emails into provider batch requests of up to
+    EMAIL_BATCH_SIZE messages
+    """
+    # Batches claimed by a worker that died go back to 'pending' for this run
+    release_expired_claims(batchable=True)
+    transport = get_transport()
+    sent_count = 0
+    fallback_count = 0
+    while True:
+        emails = claim_email_batch(settings.EMAIL_BATCH_SIZE)
+        if not emails:
+            break
+        sent, fallback = deliver_email_batch(transport, emails)
+        sent_count += sent
+        fallback_count += fallback
+
+    return f"sent {sent_count} emails in batches, {fallback_count} fell back to single sends"
+
+
+@shared_task
+def fan_out_notifications(recipient_ids, event):
+    """Apply preference filtering and bulk-insert notifications off the request path"""
+    return len(create_notifications(recipient_ids, event))
+
+
+@shared_task
+def reconcile_unread_notification_counts(chunk_size=500):
+    """
+    Overwrite cached unread counters with the database counts so that any
+    drift (failed Redis writes, rolled back requests) does not persist
+    """
+    user_ids = list(scan_unread_count_user_ids())
+    r = get_redis_connection()
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        counts = dict(
+            Notification.objects.filter(recipient_id__in=chunk, is_read=False)
+            .values("recipient_id")
+            .annotate(unread=Count("id"))
+            .values_list("recipient_id", "unread")
+        )
+        pipe = r.pipeline(transaction=False)
+        for user_id in chunk:
+            pipe.set(unread_count_key(user_id), counts.get(user_id, 0), ex=settings.NOTIFICATION_UNREAD_COUNT_TTL)
+        pipe.execute()
+    return len(user_ids)
+
+
+@shared_task
+@use_replica
+def refresh_friend_suggestions(batch_size=500):
+    """
+    Recompute suggestions for users marked dirty by friendship and trip
+    membership changes. Users without cached suggestions are skipped; they
+    are computed on their next read. The aggregates read from the replica:
+    suggestions are advisory, so replica lag only delays them.
+    """
+    r = get_redis_connection()
+    refreshed = 0
+    while True:
+        user_ids = [int(user_id) for user_id in r.spop(DIRTY_SUGGESTIONS_KEY, batch_size)]
+        if not user_ids:
+            return refreshed
+        done = 0
+        try:
+            pipe = r.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.exists(suggestions_key(user_id))
+            for user_id, cached in zip(user_ids, pipe.execute()):
+                if cached:
+                    store_suggestions(r, user_id, compute_suggestions(user_id))
+                    refreshed += 1
+                done += 1
+        except Exception:
+            # Hand the users this run did not get to back to the next one
+            try:
+                r.sadd(DIRTY_SUGGESTIONS_KEY, *user_ids[done:])
+            except redis.RedisError:
+                logger.warning('Could not requeue friend suggestions', exc_info=True)
+            raise
+
+
+ARCHIVED_NOTIFICATION_FIELDS = [
+    "id",
+    "recipient_id",
+    "sender_id",
+    "notification_type",
+    "title",
+    "message",
+    "is_read",
+    "related_object_id",
+    "related_trip_id",
+    "count",
+    "created_at",
+]
+
+
+@shared_task
+def archive_old_notifications(batch_size=1000):
+    """
+    Move notifications older than NOTIFICATION_RETENTION_DAYS into
+    NotificationArchive in batches, keeping the hot table small
+    """
+    cutoff = timezone.now() - timezone.timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    archived_count = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Notification.objects.select_for_update(skip_locked=True)
+                .filter(created_at__lt=cutoff)
+                .order_by("created_at", "id")
+                .values(*ARCHIVED_NOTIFICATION_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+
+            NotificationArchive.objects.bulk_create([
+                NotificationArchive(**{key: value for key, value in row.items() if key != "id"})
+                for row in rows
+            ])
+            Notification.objects.filter(id__in=[row["id"] for row in rows]).delete()
+
+            unread = Counter(row["recipient_id"] for row in rows if not row["is_read"])
+            transaction.on_commit(lambda unread=unread: adjust_unread_counts({
+                user_id: -count for user_id, count in unread.items()
+            }))
+        archived_count += len(rows)
+
+    return f"archived {archived_count} notifications"
+
+
+def build_digest_notification(user_id, items):
+    labels = dict(Notification.TYPE_CHOICES)
+    counts = Counter(item.notification_type for item in items)
+    summary = ", ".join(
+        f"{labels.get(notification_type, notification_type)} ({count})"
+        for notification_type, count in counts.most_common()
+    )
+    trip_ids = {item.related_trip_id for item in items}
+    return Notification(
+        recipient_id=user_id,
+        notification_type="digest",
+        title=f"{len(items)} updates since your last digest",
+        message=summary,
+        related_trip_id=trip_ids.pop() if len(trip_ids) == 1 else None,
+        count=len(items),
+    )
+
+
+@shared_task
+def send_notification_digests(frequency, chunk_size=500):
+    """
+    Turn held-back notifications into one summary notification per user.
+    Runs per digest frequency; users who have since left digest mode are
+    flushed on every run.
+    """
+    recipient_ids = PendingDigestNotification.objects.values("recipient_id").distinct()
+    preferences = dict(
+        UserPreferences.objects.filter(user_id__in=recipient_ids).values_list("user_id", "data")
+    )
+    user_ids = [
+        user_id
+        for user_id in recipient_ids.values_list("recipient_id", flat=True)
+        if get_digest_frequency(preferences.get(user_id)) in (frequency, None)
+    ]
+
+    digest_count = 0
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        items_by_user = {}
+        for item in PendingDigestNotification.objects.filter(recipient_id__in=chunk):
+            items_by_user.setdefault(item.recipient_id, []).append(item)
+
+        with transaction.atomic():
+            created = Notification.objects.bulk_create([
+                build_digest_notification(user_id, items) for user_id, items in items_by_user.items()
+            ])
+            PendingDigestNotification.objects.filter(
+                id__in=[item.id for items in items_by_user.values() for item in items]
+            ).delete()
+
+        adjust_unread_counts({notification.recipient_id: 1 for notification in created})
+        for notification in created:
+            publish_notification(notification)
+        digest_count += len(created)
+
+    return f"sent {digest_count} {frequency} digests"
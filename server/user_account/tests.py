@@ -0,0 +1,585 @@
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
+
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import local_token_cache, serialize_user
+from trip.models import Trip
+from tripwhizz.test_runner import clear_redis
+
+from . import friends
+from .email_transport import EmailTransportError, LocMemTransport
+from .models import Friendship, Notification, OutboundEmail, PendingDigestNotification, Profile, UserPreferences
+from .notifications import create_notifications
+from .redis_utils import adjust_unread_counts, get_redis_connection, get_unread_count, signup_session_key
+from .serializers import visible_avatar_url
+from .suggestions import DIRTY_SUGGESTIONS_KEY, get_suggestions, store_suggestions
+from .tasks import (
+    dispatch_outbound_email_batches,
+    fan_out_notifications,
+    refresh_friend_suggestions,
+    requeue_stale_outbound_emails,
+    send_notification_digests,
+)
+from .throttling import check_rate_limit
+from .utils import send_email
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Profile.objects.create_user(
+            username="ada", email="ada@example.com", password="pw", is_superuser=True
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        clear_redis()
+        local_token_cache.entries.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_snapshot_leaves_out_credentials_and_permissions(self):
+        fields = json.loads(serialize_user(self.user))[0]["fields"]
+        self.assertEqual(fields["email"], "ada@example.com")
+        for secret in ("password", "is_superuser", "groups", "user_permissions"):
+            self.assertNotIn(secret, fields)
+
+    def test_profile_update_keeps_newer_database_values(self):
+        self.assertEqual(self.client.get("/api/auth/user/me/").status_code, 200)
+        # Written behind the cached snapshot's back
+        Profile.objects.filter(pk=self.user.pk).update(last_name="Lovelace")
+
+        response = self.client.put("/api/auth/user/me/", {"first_name": "Ada"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        user = Profile.objects.get(pk=self.user.pk)
+        self.assertEqual((user.first_name, user.last_name), ("Ada", "Lovelace"))
+        self.assertTrue(user.check_password("pw"))
+        self.assertTrue(user.is_superuser)
+
+
+@override_settings(EMAIL_TRANSPORT="user_account.email_transport.LocMemTransport", EMAIL_MAX_RETRIES=3)
+class OutboundEmailTests(TestCase):
+    def setUp(self):
+        LocMemTransport.outbox.clear()
+
+    def claimed_email(self, claimed_ago, attempts=0, batchable=False):
+        email = OutboundEmail.objects.create(
+            to=["ada@example.com"], subject="Hi", html_message="<p>Hi</p>", attempts=attempts, batchable=batchable
+        )
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status="sending", updated_at=timezone.now() - timedelta(seconds=claimed_ago)
+        )
+        return email
+
+    def test_email_is_sent_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            email = send_email("Hi", "<p>Hi</p>", ["ada@example.com"])
+            self.assertEqual(LocMemTransport.outbox, [])
+        email.refresh_from_db()
+        self.assertEqual(email.status, "sent")
+        self.assertEqual([message["to"] for message in LocMemTransport.outbox], [["ada@example.com"]])
+
+    def test_permanent_failure_is_dead_lettered(self):
+        error = EmailTransportError("Bad payload", retryable=False)
+        with mock.patch.object(LocMemTransport, "send", side_effect=error):
+            with self.captureOnCommitCallbacks(execute=True):
+                email = send_email("Hi", "<p>Hi</p>", ["ada@example.com"])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("dead", 1))
+
+    def test_expired_claim_is_requeued_and_sent(self):
+        email = self.claimed_email(claimed_ago=3600)
+        requeue_stale_outbound_emails()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("sent", 2))
+        self.assertEqual(len(LocMemTransport.outbox), 1)
+
+    def test_claim_within_its_lease_is_left_alone(self):
+        email = self.claimed_email(claimed_ago=10)
+        requeue_stale_outbound_emails()
+        email.refresh_from_db()
+        self.assertEqual(email.status, "sending")
+        self.assertEqual(LocMemTransport.outbox, [])
+
+    def test_repeatedly_expired_claim_is_dead_lettered(self):
+        email = self.claimed_email(claimed_ago=3600, attempts=2)
+        requeue_stale_outbound_emails()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("dead", 3))
+        self.assertEqual(LocMemTransport.outbox, [])
+
+    def test_expired_batch_claim_goes_out_with_the_next_batch(self):
+        expired = self.claimed_email(claimed_ago=3600, batchable=True)
+        in_flight = self.claimed_email(claimed_ago=10, batchable=True)
+        send_email("Hi", "<p>Hi</p>", ["grace@example.com"], batch=True)
+        dispatch_outbound_email_batches()
+        expired.refresh_from_db()
+        in_flight.refresh_from_db()
+        self.assertEqual((expired.status, expired.attempts), ("sent", 2))
+        self.assertEqual(in_flight.status, "sending")
+        self.assertEqual(len(LocMemTransport.outbox), 2)
+
+
+class GoogleStubHandler(BaseHTTPRequestHandler):
+    """Answers userinfo requests according to the token in the Authorization header"""
+
+    def do_GET(self):
+        token = self.headers["Authorization"].removeprefix("Bearer ")
+        if token == "slow":
+            time.sleep(1)
+            return
+        if token == "garbled":
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"<html>")
+            return
+        if token == "expired":
+            self.send_response(401)
+            body = {"error": "invalid_token"}
+        elif token == "outage":
+            self.send_response(503)
+            body = {"error": {"code": 503, "message": "The service is currently unavailable."}}
+        else:
+            self.send_response(200)
+            body = {
+                "sub": "1",
+                "email": "Ada@Example.com",
+                "email_verified": True,
+                "name": "Ada Lovelace",
+                "given_name": "Ada",
+                "family_name": "Lovelace",
+            }
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class GoogleAuthViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), GoogleStubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/userinfo"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        clear_redis()
+
+    def login(self, token, url=None):
+        with override_settings(GOOGLE_RESPONSE_URL=url or self.url, GOOGLE_HTTP_TIMEOUT=0.5):
+            return APIClient().post("/api/auth/google-login/", {"token": token}, format="json")
+
+    def test_valid_token_signs_the_user_in(self):
+        response = self.login("valid")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Profile.objects.filter(email="ada@example.com").exists())
+
+    def test_rejected_token_is_a_bad_request(self):
+        self.assertEqual(self.login("expired").status_code, 400)
+
+    def test_timeout_is_service_unavailable(self):
+        self.assertEqual(self.login("slow").status_code, 503)
+
+    def test_unreachable_google_is_service_unavailable(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            closed_url = f"http://127.0.0.1:{sock.getsockname()[1]}/userinfo"
+        self.assertEqual(self.login("valid", url=closed_url).status_code, 503)
+
+    def test_google_outage_is_service_unavailable(self):
+        self.assertEqual(self.login("outage").status_code, 503)
+
+    def test_invalid_response_is_bad_gateway(self):
+        self.assertEqual(self.login("garbled").status_code, 502)
+
+
+@mock.patch("user_account.views.generate_otp", return_value="123456")
+class SignupOTPTests(TestCase):
+    def setUp(self):
+        clear_redis()
+        self.client = APIClient()
+
+    def sign_up(self):
+        response = self.client.post(
+            "/api/auth/user/", {"email": "ada@example.com", "password": "s3cret-pw"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def verify(self, code):
+        return self.client.post("/api/auth/user/verify/", {"email": "ada@example.com", "code": code}, format="json")
+
+    def test_correct_code_creates_the_account(self, _):
+        self.sign_up()
+        self.assertFalse(Profile.objects.filter(email="ada@example.com").exists())
+        response = self.verify("123456")
+        self.assertEqual(response.status_code, 201)
+        user = Profile.objects.get(email="ada@example.com")
+        self.assertTrue(user.check_password("s3cret-pw"))
+        self.assertEqual(response.data["token"], Token.objects.get(user=user).key)
+        self.assertFalse(get_redis_connection().exists(signup_session_key("ada@example.com")))
+
+    def test_wrong_code_keeps_the_session(self, _):
+        self.sign_up()
+        self.assertEqual(self.verify("654321").status_code, 400)
+        self.assertFalse(Profile.objects.filter(email="ada@example.com").exists())
+        self.assertEqual(self.verify("123456").status_code, 201)
+
+    def test_replayed_code_is_rejected(self, _):
+        self.sign_up()
+        self.assertEqual(self.verify("123456").status_code, 201)
+        self.assertEqual(self.verify("123456").status_code, 404)
+        self.assertEqual(Profile.objects.filter(email="ada@example.com").count(), 1)
+
+    def test_expired_session_is_rejected(self, _):
+        self.sign_up()
+        get_redis_connection().pexpire(signup_session_key("ada@example.com"), 1)
+        time.sleep(0.01)
+        self.assertEqual(self.verify("123456").status_code, 404)
+        self.assertFalse(Profile.objects.filter(email="ada@example.com").exists())
+
+
+class FriendRequestListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Profile.objects.create_user(username="ada", email="ada@example.com", password="pw")
+        others = [
+            Profile.objects.create_user(username=f"user{index}", email=f"user{index}@example.com", password="pw")
+            for index in range(4)
+        ]
+        for other in others[:3]:
+            Friendship.objects.create(sender=cls.user, receiver=other)
+        cls.incoming = Friendship.objects.create(sender=others[3], receiver=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_sent_requests_cannot_push_received_ones_off_the_page(self):
+        page = self.client.get("/api/auth/friends/requests/", {"page_size": 2}).data
+        self.assertEqual([request["id"] for request in page["received"]], [self.incoming.pk])
+        self.assertEqual(len(page["sent"]), 2)
+        self.assertIsNone(page["received_next"])
+
+        rest = self.client.get(page["sent_next"]).data
+        self.assertEqual(len(rest["sent"]), 1)
+        self.assertIsNone(rest["sent_next"])
+
+
+class FriendSetCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ada, cls.grace, cls.alan = [
+            Profile.objects.create_user(username=name, email=f"{name}@example.com", password="pw")
+            for name in ("ada", "grace", "alan")
+        ]
+
+    def setUp(self):
+        clear_redis()
+
+    def befriend(self, sender, receiver, status="accepted"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Friendship.objects.create(sender=sender, receiver=receiver, status=status)
+
+    def test_rebuild_racing_a_new_friendship_is_not_cached(self):
+        query_friend_ids = friends.query_friend_ids
+
+        def query_then_befriend(user_id):
+            friend_ids = query_friend_ids(user_id)
+            # Commits after the rebuild read the database but before it stores the set
+            self.befriend(self.grace, self.ada)
+            return friend_ids
+
+        with mock.patch.object(friends, "query_friend_ids", side_effect=query_then_befriend):
+            self.assertEqual(friends.get_friend_ids(self.ada.pk), set())
+        self.assertEqual(friends.get_friend_ids(self.ada.pk), {self.grace.pk})
+
+    def test_opposite_direction_keeps_the_friendship(self):
+        self.befriend(self.ada, self.grace)
+        self.assertTrue(friends.are_friends(self.ada.pk, self.grace.pk))
+        self.befriend(self.grace, self.ada, status="rejected")
+        self.assertTrue(friends.are_friends(self.ada.pk, self.grace.pk))
+        self.assertTrue(friends.are_friends(self.grace.pk, self.ada.pk))
+
+    def test_deleting_the_friendship_updates_both_sets(self):
+        friendship = self.befriend(self.ada, self.alan)
+        self.assertEqual(friends.get_friend_ids(self.alan.pk), {self.ada.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship.delete()
+        self.assertEqual(friends.get_friend_ids(self.ada.pk), set())
+        self.assertEqual(friends.get_friend_ids(self.alan.pk), set())
+
+
+class UnreadCountCacheTests(TestCase):
+    def setUp(self):
+        clear_redis()
+
+    def test_rebuild_racing_a_new_notification_is_not_cached(self):
+        def rebuild_then_notify():
+            # The notification lands after the rebuild counted but before it stores the count
+            adjust_unread_counts({1: 1})
+            return 0
+
+        self.assertEqual(get_unread_count(1, rebuild_then_notify), 0)
+        self.assertEqual(get_unread_count(1, lambda: 1), 1)
+
+    def test_rebuilt_count_is_cached_and_adjusted(self):
+        self.assertEqual(get_unread_count(1, lambda: 3), 3)
+        adjust_unread_counts({1: -1})
+        self.assertEqual(get_unread_count(1, lambda: 0), 2)
+
+    def test_marking_a_notification_read_twice_decrements_once(self):
+        user = Profile.objects.create_user(username="ada", email="ada@example.com", password="pw")
+        notifications = Notification.objects.bulk_create(
+            Notification(recipient=user, notification_type="trip_update", title="Trip", message="Updated")
+            for _ in range(2)
+        )
+        self.assertEqual(get_unread_count(user.pk, lambda: 2), 2)
+        client = APIClient()
+        client.force_authenticate(user)
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.put(f"/api/auth/notifications/read/{notifications[0].pk}/")
+            self.assertTrue(response.data["is_read"])
+        self.assertEqual(get_unread_count(user.pk, lambda: 0), 1)
+
+
+def packing_event(trip, item):
+    return {
+        "notification_type": "packing_added",
+        "title": "Packing list updated",
+        "message": f"{item} was added",
+        "trip_id": trip.pk,
+    }
+
+
+class NotificationDeliveryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ada, cls.grace = [
+            Profile.objects.create_user(username=name, email=f"{name}@example.com", password="pw")
+            for name in ("ada", "grace")
+        ]
+        cls.trip = Trip.objects.create(name="Trip", destination="Lisbon", owner=cls.ada)
+
+    def setUp(self):
+        clear_redis()
+
+    def test_burst_within_the_window_collapses_into_one_row(self):
+        for item in ("Tent", "Stove", "Map"):
+            create_notifications([self.ada.pk], packing_event(self.trip, item))
+        notification = Notification.objects.get(recipient=self.ada)
+        self.assertEqual(notification.count, 3)
+        self.assertEqual(notification.message, "Map was added")
+
+    def test_burst_outside_the_window_starts_a_new_row(self):
+        create_notifications([self.ada.pk], packing_event(self.trip, "Tent"))
+        Notification.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        create_notifications([self.ada.pk], packing_event(self.trip, "Stove"))
+        self.assertEqual(sorted(Notification.objects.values_list("count", flat=True)), [1, 1])
+
+    def test_digest_mode_holds_notifications_until_the_digest(self):
+        UserPreferences.objects.create(user=self.ada, data={"notifications": {"digest": "hourly"}})
+        for item in ("Tent", "Stove"):
+            create_notifications([self.ada.pk, self.grace.pk], packing_event(self.trip, item))
+        self.assertFalse(Notification.objects.filter(recipient=self.ada).exists())
+        self.assertEqual(Notification.objects.get(recipient=self.grace).count, 2)
+
+        send_notification_digests("daily")
+        self.assertFalse(Notification.objects.filter(recipient=self.ada).exists())
+
+        send_notification_digests("hourly")
+        digest = Notification.objects.get(recipient=self.ada)
+        self.assertEqual((digest.notification_type, digest.count), ("digest", 2))
+        self.assertEqual(digest.related_trip_id, self.trip.pk)
+        self.assertFalse(PendingDigestNotification.objects.exists())
+
+    def test_fan_out_loads_preferences_once_and_skips_opted_out_recipients(self):
+        others = [
+            Profile.objects.create_user(username=f"user{index}", email=f"user{index}@example.com", password="pw")
+            for index in range(5)
+        ]
+        UserPreferences.objects.create(user=self.grace, data={"notifications": {"trip_update": False}})
+        recipient_ids = [self.ada.pk, self.grace.pk, *(other.pk for other in others)]
+        event = {
+            "notification_type": "trip_update",
+            "title": "Trip updated",
+            "message": "Dates changed",
+            "preference_key": "trip_update",
+        }
+        # One preference query and one insert, however many recipients
+        with self.assertNumQueries(2):
+            self.assertEqual(fan_out_notifications(recipient_ids, event), 6)
+        self.assertEqual(
+            set(Notification.objects.values_list("recipient_id", flat=True)),
+            set(recipient_ids) - {self.grace.pk},
+        )
+
+
+class FriendSuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ada, cls.grace, cls.alan, cls.edsger = [
+            Profile.objects.create_user(username=name, email=f"{name}@example.com", password="pw")
+            for name in ("ada", "grace", "alan", "edsger")
+        ]
+
+    def setUp(self):
+        clear_redis()
+
+    def dirty_ids(self):
+        return {int(user_id) for user_id in get_redis_connection().smembers(DIRTY_SUGGESTIONS_KEY)}
+
+    def befriend(self, sender, receiver):
+        with self.captureOnCommitCallbacks(execute=True):
+            Friendship.objects.create(sender=sender, receiver=receiver, status="accepted")
+
+    def test_friends_of_friends_and_co_travellers_are_ranked(self):
+        self.befriend(self.ada, self.grace)
+        self.befriend(self.grace, self.alan)
+        trip = Trip.objects.create(name="Trip", destination="Lisbon", owner=self.ada)
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.participants.add(self.ada, self.alan, self.edsger)
+        self.assertEqual(
+            get_suggestions(self.ada.pk),
+            [[self.alan.pk, 1, 1], [self.edsger.pk, 0, 1]],
+        )
+
+    def test_trip_membership_change_marks_members_dirty(self):
+        trip = Trip.objects.create(name="Trip", destination="Lisbon", owner=self.ada)
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.participants.add(self.ada, self.grace)
+        self.assertEqual(self.dirty_ids(), {self.ada.pk, self.grace.pk})
+        get_redis_connection().delete(DIRTY_SUGGESTIONS_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            # From the user's side of the relation
+            self.alan.participating_trips.add(trip)
+        self.assertEqual(self.dirty_ids(), {self.ada.pk, self.grace.pk, self.alan.pk})
+
+    def test_failed_refresh_keeps_unprocessed_users_dirty(self):
+        r = get_redis_connection()
+        user_ids = [self.ada.pk, self.grace.pk, self.alan.pk]
+        for user_id in user_ids:
+            store_suggestions(r, user_id, [])
+        r.sadd(DIRTY_SUGGESTIONS_KEY, *user_ids)
+
+        with mock.patch("user_account.tasks.compute_suggestions", side_effect=[[], DatabaseError]):
+            with self.assertRaises(DatabaseError):
+                refresh_friend_suggestions()
+        self.assertEqual(len(self.dirty_ids()), 2)
+
+        refresh_friend_suggestions()
+        self.assertEqual(self.dirty_ids(), set())
+
+
+class AvatarPrivacyTests(TestCase):
+    def setUp(self):
+        self.user = Profile.objects.create_user(username="ada", email="ada@example.com", password="pw")
+        self.user.avatar.name = "avatars/ada.png"
+
+    def test_avatar_is_shown_by_default(self):
+        self.assertEqual(visible_avatar_url(self.user), self.user.avatar.url)
+
+    def test_hidden_profile_hides_the_avatar(self):
+        UserPreferences.objects.create(user=self.user, data={"privacy": {"profile_visible": False}})
+        self.user = Profile.objects.get(pk=self.user.pk)
+        self.user.avatar.name = "avatars/ada.png"
+        self.assertIsNone(visible_avatar_url(self.user))
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        clear_redis()
+
+    def test_parallel_requests_never_exceed_the_burst(self):
+        limit = 10
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda _: check_rate_limit("test", "client", limit, 3600), range(50)))
+        self.assertEqual(sum(allowed for allowed, _ in results), limit)
+        self.assertTrue(all(retry_after > 0 for allowed, retry_after in results if not allowed))
+
+    def test_cost_is_charged_per_unit(self):
+        self.assertTrue(check_rate_limit("test", "client", 10, 3600, cost=8)[0])
+        self.assertFalse(check_rate_limit("test", "client", 10, 3600, cost=3)[0])
+        self.assertTrue(check_rate_limit("test", "client", 10, 3600, cost=2)[0])
+
+
+@skipUnless(connection.vendor == "postgresql", "Trigram ranking is PostgreSQL specific")
+class UserSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def create(username, **fields):
+            return Profile.objects.create_user(
+                username=username, email=f"{username}@example.com", password="pw", **fields
+            )
+
+        cls.searcher = create("adaeze")
+        for username in ("ada", "adalyn", "canada", "bob"):
+            create(username)
+        create("zoe", last_name="Van Ada")
+        Friendship.objects.create(sender=cls.searcher, receiver=create("adamant"), status="accepted")
+
+    def search(self, query):
+        return [user.username for user in friends.search_users(self.searcher, query, 10)]
+
+    def test_short_query_matches_prefixes_only(self):
+        self.assertEqual(self.search("ad"), ["ada", "adalyn"])
+
+    def test_prefix_matches_come_first_then_closest_words(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest("pg_trgm is not installed")
+        # Self and friends are excluded; "Van Ada" contains the whole word, "canada" only part of it
+        self.assertEqual(self.search("ada"), ["ada", "adalyn", "zoe", "canada"])
+
+
+@skipUnless(connection.vendor == "postgresql", "Index plans are PostgreSQL specific")
+class HotPathIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Profile.objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+    def assertUsesIndex(self, queryset, index_name):
+        # Test tables are tiny, so take sequential scans off the table to see which index the planner picks
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertIn(index_name, queryset.explain())
+
+    def test_incoming_requests_use_the_pending_index(self):
+        self.assertUsesIndex(
+            Friendship.objects.filter(receiver=self.user, status="pending").order_by("-created_at"),
+            "friendship_pending_idx",
+        )
+
+    def test_unread_count_uses_the_read_index(self):
+        Notification.objects.bulk_create(
+            Notification(recipient=self.user, notification_type="friend_request", title="Hi", message="Hi", is_read=index > 5)
+            for index in range(500)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE user_account_notification")
+        self.assertUsesIndex(
+            Notification.objects.filter(recipient=self.user, is_read=False).values("id"),
+            "notif_recipient_read_idx",
+        )
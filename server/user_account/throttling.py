@@ -0,0 +1,121 @@
+import logging
+
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework.throttling import BaseThrottle
+
+from .redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY = "rate:{scope}:{ident}"
+
+# GCRA: the key holds the theoretical arrival time (TAT) in milliseconds. Each
+# request pushes it `cost * period / limit` further; a request is refused if that
+# would put it more than `period` ahead of now. This allows a burst of `limit`
+# requests and then a sustained `limit` per `period`. Returns {allowed, retry_after_ms}.
+_GCRA = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local interval = period / limit * tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if now < allow_at then
+    return {0, math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+
+def check_rate_limit(scope, ident, limit, period, cost=1):
+    """
+    Record a request for `ident` in `scope` counting as `cost` requests and
+    return (allowed, retry_after seconds), all in one atomic round trip. Fails
+    open if Redis is down.
+    """
+    try:
+        allowed, retry_after_ms = get_redis_connection().eval(
+            _GCRA, 1, RATE_LIMIT_KEY.format(scope=scope, ident=ident), limit, period * 1000, cost
+        )
+    except RedisError:
+        logger.warning("Rate limiter unavailable for %s", scope)
+        return True, 0
+    return bool(allowed), retry_after_ms / 1000
+
+
+class RedisRateThrottle(BaseThrottle):
+    """
+    DRF throttle backed by check_rate_limit(). Limits come from
+    settings.RATE_LIMITS[scope] as (requests, seconds); requests are keyed by
+    user id when authenticated and by client IP otherwise.
+    """
+    scope = None
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def get_cost(self, request):
+        """How many requests this one counts as"""
+        return 1
+
+    def allow_request(self, request, view):
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+        limit, period = settings.RATE_LIMITS[self.scope]
+        allowed, self.retry_after = check_rate_limit(self.scope, ident, limit, period, self.get_cost(request))
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class EmailRateThrottle(RedisRateThrottle):
+    """Keyed by the email in the request body, so guesses against one account are capped across IPs"""
+
+    def get_ident_key(self, request):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if not email:
+            return super().get_ident_key(request)
+        return f"email:{str(email).strip().lower()}"
+
+
+class LoginRateThrottle(RedisRateThrottle):
+    scope = "login"
+
+
+class OTPVerifyRateThrottle(EmailRateThrottle):
+    scope = "otp_verify"
+
+
+class ResendOTPRateThrottle(EmailRateThrottle):
+    scope = "resend_otp"
+
+
+class PasswordResetRateThrottle(EmailRateThrottle):
+    scope = "password_reset"
+
+
+class TripInviteRateThrottle(RedisRateThrottle):
+    """Each invitee in a batch invite counts as one invitation"""
+    scope = "trip_invite"
+
+    def get_cost(self, request):
+        invitee_ids = request.data.get("invitee_ids") if hasattr(request.data, "get") else None
+        if not isinstance(invitee_ids, list):
+            return 1
+        # Oversized batches are rejected by the view; never charge more than the burst
+        return min(max(len(invitee_ids), 1), settings.RATE_LIMITS[self.scope][0])
+
+
+class FriendRequestRateThrottle(RedisRateThrottle):
+    scope = "friend_request"
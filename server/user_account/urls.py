@@ -6,6 +6,7 @@ urlpatterns = [
     path("user/", views.AddUserView.as_view(), name="user_operations"),
     path("user/<int:user_id>/", views.UserView.as_view(), name="user_delete"),
     path("user/login/", views.LoginView.as_view(), name="user_login"),
+    path("user/logout/", views.LogoutView.as_view(), name="user_logout"),
     path("user/me/", views.UserView.as_view(), name="current_user"),
     path(
         "user/password-reset/",
@@ -26,6 +27,7 @@ urlpatterns = [
     path("friends/request/", views.SendFriendRequestView.as_view(), name="send_friend_request"),
     path("friends/request/<int:pk>/", views.FriendRequestActionView.as_view(), name="friend_request_action"),
     path("friends/search/", views.FriendSearchView.as_view(), name="friend_search"),
+    path("friends/suggestions/", views.FriendSuggestionsView.as_view(), name="friend_suggestions"),
     path("friends/<int:pk>/", views.FriendDeleteView.as_view(), name="friend_delete"),
 
     path("notifications/", views.NotificationListView.as_view(), name="notification_list"),
@@ -1,11 +1,13 @@
 import secrets
 import logging
-import os
-import requests
 
-from django.template.loader import render_to_string
+from django.db import transaction
+from django.template.loader import get_template
 from django.conf import settings
 
+from .models import OutboundEmail
+from .tasks import send_outbound_email
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,33 +15,41 @@ def generate_otp():
     return ''.join(secrets.choice('0123456789') for _ in range(6))
 
 
-def send_email(subject, html_message, to_list, text_message=None):
-    api_key = os.getenv('RESEND_API_KEY')
-    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None)
-    if not api_key or not from_email:
-        msg = 'Resend not configured: missing RESEND_API_KEY or DEFAULT_FROM_EMAIL'
-        logger.error(msg)
-        return
-
-    try:
-        requests.post(
-            'https://api.resend.com/emails',
-            headers={
-                'Authorization': f'Bearer {api_key}',
-                'Content-Type': 'application/json',
-            },
-            json={
-                'from': from_email,
-                'to': to_list,
-                'subject': subject,
-                'html': html_message,
-                **({'text': text_message} if text_message else {}),
-            },
-            timeout=10,
-        )
-    except Exception as ex:
-        logger.exception('Resend API failed: %s', ex)
-        return
+def send_email(subject, html_message, to_list, text_message=None, batch=False):
+    """
+    Queue an email for delivery. The message is stored in the outbox and
+    handed to Celery once the surrounding transaction commits, so request
+    handlers never wait on the provider. Non-urgent mail can pass
+    ``batch=True`` to go out with the next provider batch request instead.
+    """
+    email = OutboundEmail.objects.create(
+        to=list(to_list),
+        subject=subject,
+        html_message=html_message,
+        text_message=text_message or "",
+        batchable=batch,
+    )
+    if not batch:
+        transaction.on_commit(lambda: send_outbound_email.delay(email.id))
+    return email
+
+
+def render_email(template_name, context):
+    """
+    Render an email body through the project template engine. Django's
+    default cached loader compiles each template once per process.
+    """
+    return get_template(template_name).render(context)
+
+
+def build_trip_email_context(trip):
+    """Trip-level context shared by every email about the same trip"""
+    return {
+        'trip': trip,
+        'destination': trip.destination,
+        'participant_count': trip.participants.count() + 1,  # +1 for owner
+        'app_url': settings.FRONTEND_URL,
+    }
 
 
 def send_password_reset_email(user, reset_link):
@@ -48,42 +58,39 @@ def send_password_reset_email(user, reset_link):
         'user': user,
         'reset_link': reset_link,
     }
-    message = render_to_string('password_reset_email.html', context)
+    message = render_email('password_reset_email.html', context)
     send_email(subject, message, [user.email])
 
 
-def send_otp_email(user, otp_code):
+def send_otp_email(email, otp_code):
     subject = 'Your OTP Code'
     context = {
-        'user': user,
+        'email': email,
         'otp_code': otp_code,
     }
-    message = render_to_string('send_otp_email.html', context)
-    send_email(subject, message, [user.email])
-
+    message = render_email('send_otp_email.html', context)
+    send_email(subject, message, [email])
 
-def send_trip_invitation_email(invitation):
-    subject = f'🌍 You\'re invited to join "{invitation.trip.name}" on TripWhizz!'
 
-    participant_count = invitation.trip.participants.count() + 1  # +1 for owner
+def build_trip_invitation_email(invitation, trip_context):
+    trip = trip_context['trip']
+    subject = f'🌍 You\'re invited to join "{trip.name}" on TripWhizz!'
 
     context = {
-        'trip': invitation.trip,
+        **trip_context,
         'inviter': invitation.inviter,
         'invitee': invitation.invitee,
-        'participant_count': participant_count,
-        'app_url': settings.FRONTEND_URL,
         'invitation': invitation,
     }
 
-    html_message = render_to_string('trip_invitation_email.html', context)
+    html_message = render_email('trip_invitation_email.html', context)
 
     text_message = f"""
     Hi {invitation.invitee.first_name or invitation.invitee.username}!
 
-    {invitation.inviter.first_name or invitation.inviter.username} has invited you to join their trip "{invitation.trip.name}" to {invitation.trip.destination}.
+    {invitation.inviter.first_name or invitation.inviter.username} has invited you to join their trip "{trip.name}" to {trip_context['destination']}.
 
-    Open TripWhizz to view and respond to this invitation: {settings.FRONTEND_URL}
+    Open TripWhizz to view and respond to this invitation: {trip_context['app_url']}
 
     This invitation will expire in 7 days.
 
@@ -91,4 +98,27 @@ def send_trip_invitation_email(invitation):
     The TripWhizz Team
     """
 
-    send_email(subject, html_message=html_message, to_list=[invitation.invitee.email], text_message=text_message)
+    return OutboundEmail(
+        to=[invitation.invitee.email],
+        subject=subject,
+        html_message=html_message,
+        text_message=text_message,
+        batchable=True,
+    )
+
+
+def send_trip_invitation_emails(invitations):
+    """
+    Queue invitation emails for many invitations at once. Trip-level
+    context is computed once per trip and the outbox rows are written in
+    a single insert; delivery goes through the batch dispatcher.
+    """
+    trip_contexts = {}
+    emails = []
+    for invitation in invitations:
+        if invitation.trip_id not in trip_contexts:
+            trip_contexts[invitation.trip_id] = build_trip_email_context(invitation.trip)
+        emails.append(build_trip_invitation_email(invitation, trip_contexts[invitation.trip_id]))
+
+    return OutboundEmail.objects.bulk_create(emails)
+
@@ -1,10 +1,10 @@
 import json
-import os
 
 import requests
 from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.tokens import default_token_generator
 from django.db import transaction, models
 from django.http import JsonResponse
@@ -13,30 +13,53 @@ from django.utils.encoding import force_str, force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import status, filters
+from rest_framework import exceptions, status
 from rest_framework.authtoken.models import Token
 from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import PendingUser, Profile, Friendship, Notification, UserPreferences
+from .authentication import invalidate_user_tokens
+from .friends import get_friend_ids, search_users
+from .google_auth import GoogleAuthError, GoogleUnavailableError, fetch_google_userinfo
+from .models import Profile, Friendship, Notification, UserPreferences
+from .throttling import (
+    FriendRequestRateThrottle,
+    LoginRateThrottle,
+    OTPVerifyRateThrottle,
+    PasswordResetRateThrottle,
+    ResendOTPRateThrottle,
+)
 from .serializers import (
     UserSerializer,
     LoginSerializer,
     GoogleAuthResponseSerializer,
     FriendshipSerializer,
     FriendListSerializer,
+    FriendSuggestionSerializer,
     NotificationSerializer,
     UserPreferencesSerializer,
 )
+from .notifications import notify_users
+from .suggestions import get_suggestions
 from .utils import generate_otp, send_otp_email, send_password_reset_email
-from .redis_utils import check_friend_request_rate_limit, get_redis_connection
+from .redis_utils import (
+    adjust_unread_counts,
+    consume_signup_session,
+    refresh_signup_otp,
+    start_signup_session,
+    get_unread_count,
+    set_unread_count,
+)
 
 User = get_user_model()
 
 
 class LoginView(APIView):
+    throttle_classes = [LoginRateThrottle]
+
     @swagger_auto_schema(
         request_body=LoginSerializer,
         responses={200: openapi.Response("Token generated successfully")},
@@ -66,6 +89,15 @@ class LoginView(APIView):
         return Response({"token": token.key}, status=status.HTTP_200_OK)
 
 
+class LogoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        Token.objects.filter(user=request.user).delete()
+        invalidate_user_tokens(request.user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class AddUserView(APIView):
     @swagger_auto_schema(
         request_body=UserSerializer,
@@ -75,6 +107,10 @@ class AddUserView(APIView):
         data = json.loads(request.body)
         email = data.get("email")
         password = data.get("password")
+        if not email or not password:
+            return Response(
+                {"error": "Email and password are required"}, status=status.HTTP_400_BAD_REQUEST
+            )
 
         if User.objects.filter(email=email).exists():
             return Response(
@@ -82,23 +118,12 @@ class AddUserView(APIView):
             )
 
         otp_code = generate_otp()
-        pending_user, created = PendingUser.objects.get_or_create(email=email)
-        if created is False:
-            if hasattr(pending_user, "password"):
-                pending_user.password = ""
-            if hasattr(pending_user, "otp"):
-                pending_user.otp = ""
-            pending_user.save(update_fields=[f for f in ["password", "otp"] if hasattr(pending_user, f)])
-
-        r = get_redis_connection()
-        # 10 minutes TTL for OTP and password
-        r.setex(f"signup:otp:{email}", 10 * 60, otp_code)
-        r.setex(f"signup:pwd:{email}", 10 * 60, password)
-
-        send_otp_email(pending_user, otp_code)
+        # Only the hash is kept; the account is created from it once the OTP is verified
+        start_signup_session(email, otp_code, make_password(password))
+        send_otp_email(email, otp_code)
 
         return Response(
-            {"message": "OTP sent. Please verify.", "email": str(pending_user.email)}
+            {"message": "OTP sent. Please verify.", "email": str(email)}
         )
 
 
@@ -109,14 +134,17 @@ class UserView(APIView):
         request_body=UserSerializer,
         responses={200: openapi.Response("User updated successfully")},
     )
+    @transaction.atomic
     def put(self, request, user_id=None):
-        user = request.user if user_id is None else User.objects.get(id=user_id)
+        # request.user may be a cached snapshot, so always save over a fresh row
+        user = User.objects.select_for_update().get(id=request.user.id if user_id is None else user_id)
 
         serializer = UserSerializer(
             user, data=request.data, partial=True, context={"request": request}
         )
         if serializer.is_valid():
             serializer.save()
+            transaction.on_commit(lambda: invalidate_user_tokens(user.id))
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -126,6 +154,7 @@ class UserView(APIView):
         try:
             user = User.objects.get(id=user_id)
             user.delete()
+            invalidate_user_tokens(user_id)
             return JsonResponse({"message": "User deleted successfully"}, status=200)
         except User.DoesNotExist:
             return JsonResponse({"error": "User not found"}, status=404)
@@ -137,6 +166,8 @@ class UserView(APIView):
 
 
 class PasswordResetView(APIView):
+    throttle_classes = [PasswordResetRateThrottle]
+
     @swagger_auto_schema(
         request_body=LoginSerializer,
         responses={200: openapi.Response("Password reset successfully")},
@@ -178,6 +209,7 @@ class PasswordResetView(APIView):
                 if serializer.is_valid():
                     user.set_password(serializer.validated_data["new_password"])
                     user.save()
+                    invalidate_user_tokens(user.id)
                     return Response(
                         {"message": "Password reset successfully"},
                         status=status.HTTP_200_OK,
@@ -202,12 +234,9 @@ class GoogleAuthView(GenericAPIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            response = requests.get(
-                os.getenv("GOOGLE_RESPONSE_URL"),
-                headers={"Authorization": f"Bearer {access_token}"})
-            response_data = response.json()
-
-            if "error" in response_data:
+            try:
+                response_data = fetch_google_userinfo(access_token)
+            except GoogleAuthError:
                 return Response(
                     {
                         "status": "error",
@@ -216,6 +245,24 @@ class GoogleAuthView(GenericAPIView):
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            except (GoogleUnavailableError, requests.Timeout, requests.ConnectionError):
+                return Response(
+                    {
+                        "status": "error",
+                        "message": "Google sign-in is temporarily unavailable, please try again.",
+                        "payload": {},
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+            except requests.RequestException:
+                return Response(
+                    {
+                        "status": "error",
+                        "message": "Google returned an invalid response, please try again.",
+                        "payload": {},
+                    },
+                    status=status.HTTP_502_BAD_GATEWAY,
+                )
 
         except Exception:
             return Response(
@@ -261,38 +308,29 @@ class GoogleAuthView(GenericAPIView):
 
 
 class OTPVerifyView(APIView):
+    throttle_classes = [OTPVerifyRateThrottle]
+
     def post(self, request):
         email = request.data.get("email")
         otp = request.data.get("code")
 
-        try:
-            pending_user = PendingUser.objects.get(email=email)
-        except PendingUser.DoesNotExist:
+        found, password_hash = consume_signup_session(email, otp)
+        if not found:
             return Response({"error": "Invalid session"}, status=404)
-
-        r = get_redis_connection()
-        stored_otp = r.get(f"signup:otp:{email}")
-        if isinstance(stored_otp, bytes):
-            stored_otp = stored_otp.decode("utf-8")
-        if stored_otp is None or str(stored_otp) != str(otp):
+        if password_hash is None:
             return Response({"error": "Invalid OTP"}, status=400)
+        if User.objects.filter(email=email).exists():
+            return Response(
+                {"error": "User already exists"}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        raw_password = r.get(f"signup:pwd:{email}")
-        if isinstance(raw_password, bytes):
-            raw_password = raw_password.decode("utf-8")
-        if raw_password is None:
-            return Response({"error": "Session expired. Please sign up again."}, status=400)
-
-        user = Profile.objects.create_user(
-            username=pending_user.email,
-            email=pending_user.email,
-            password=raw_password,
-        )
-
-        token, _ = Token.objects.get_or_create(user=user)
-        r.delete(f"signup:otp:{email}")
-        r.delete(f"signup:pwd:{email}")
-        pending_user.delete()
+        with transaction.atomic():
+            user = Profile.objects.create(
+                username=email,
+                email=Profile.objects.normalize_email(email),
+                password=password_hash,
+            )
+            token, _ = Token.objects.get_or_create(user=user)
 
         return Response(
             {
@@ -306,20 +344,17 @@ class OTPVerifyView(APIView):
 
 
 class ResendOtpView(APIView):
+    throttle_classes = [ResendOTPRateThrottle]
+
     def post(self, request):
         email = request.data.get("email")
 
-        try:
-            pending_user = PendingUser.objects.get(email=email)
-        except PendingUser.DoesNotExist:
+        otp_code = generate_otp()
+        if not refresh_signup_otp(email, otp_code):
             return Response(
                 {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
             )
-
-        otp_code = generate_otp()
-        r = get_redis_connection()
-        r.setex(f"signup:otp:{email}", 10 * 60, otp_code)
-        send_otp_email(pending_user, otp_code)
+        send_otp_email(email, otp_code)
 
         return Response(
             {"message": "OTP resent successfully"}, status=status.HTTP_200_OK
@@ -333,22 +368,23 @@ class FriendListView(ListAPIView):
     serializer_class = FriendListSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        # Get all accepted friendships where the user is either sender or receiver
-        friendships = Friendship.objects.filter(
-            (models.Q(sender=user) | models.Q(receiver=user))
-            & models.Q(status="accepted")
-        )
+        friend_ids = get_friend_ids(self.request.user.id)
+        return User.objects.filter(id__in=friend_ids).select_related("preferences")
 
-        # Extract the friend from each friendship
-        friend_ids = []
-        for friendship in friendships:
-            if friendship.sender == user:
-                friend_ids.append(friendship.receiver.id)
-            else:
-                friend_ids.append(friendship.sender.id)
 
-        return User.objects.filter(id__in=friend_ids)
+class FriendRequestCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
+
+
+class SentFriendRequestPagination(FriendRequestCursorPagination):
+    cursor_query_param = "sent_cursor"
+
+
+class ReceivedFriendRequestPagination(FriendRequestCursorPagination):
+    cursor_query_param = "received_cursor"
 
 
 class FriendRequestListView(APIView):
@@ -359,20 +395,22 @@ class FriendRequestListView(APIView):
     def get(self, request):
         user = request.user
 
-        # Get sent requests
-        sent_requests = Friendship.objects.filter(sender=user, status="pending")
-        sent_serializer = FriendshipSerializer(
-            sent_requests, many=True, context={"request": request}
-        )
-
-        # Get received requests
-        received_requests = Friendship.objects.filter(receiver=user, status="pending")
-        received_serializer = FriendshipSerializer(
-            received_requests, many=True, context={"request": request}
+        # Sent and received requests page independently, so neither can crowd out the other
+        pending = Friendship.objects.filter(status="pending").select_related(
+            "sender__preferences", "receiver__preferences"
         )
+        sent_paginator = SentFriendRequestPagination()
+        sent = sent_paginator.paginate_queryset(pending.filter(sender=user), request, view=self)
+        received_paginator = ReceivedFriendRequestPagination()
+        received = received_paginator.paginate_queryset(pending.filter(receiver=user), request, view=self)
 
         return Response(
-            {"sent": sent_serializer.data, "received": received_serializer.data}
+            {
+                "sent": FriendshipSerializer(sent, many=True, context={"request": request}).data,
+                "received": FriendshipSerializer(received, many=True, context={"request": request}).data,
+                "sent_next": sent_paginator.get_next_link(),
+                "received_next": received_paginator.get_next_link(),
+            }
         )
 
 
@@ -380,23 +418,14 @@ class SendFriendRequestView(APIView):
     """View to send a friend request"""
 
     permission_classes = [IsAuthenticated]
+    throttle_classes = [FriendRequestRateThrottle]
 
-    def post(self, request):
-        # Check rate limit before processing the request
-        user_id = request.user.id
-        allowed, current_count, reset_time = check_friend_request_rate_limit(user_id)
-
-        if not allowed:
-            return Response(
-                {
-                    "error": "Rate limit exceeded",
-                    "message": "You've sent too many friend requests. Please try again later.",
-                    "reset_time": reset_time,
-                    "current_count": current_count,
-                },
-                status=status.HTTP_429_TOO_MANY_REQUESTS,
-            )
+    def throttled(self, request, wait):
+        raise exceptions.Throttled(
+            wait, detail="You've sent too many friend requests. Please try again later."
+        )
 
+    def post(self, request):
         serializer = FriendshipSerializer(
             data=request.data, context={"request": request}
         )
@@ -437,14 +466,13 @@ class FriendRequestActionView(APIView):
 
         # Create notification if request is accepted
         if action == "accept":
-            Notification.objects.create(
-                recipient=friendship.sender,
-                sender=request.user,
-                notification_type="friend_accept",
-                title="Friend Request Accepted",
-                message=f"{request.user.username} accepted your friend request",
-                related_object_id=friendship.id,
-            )
+            notify_users([friendship.sender_id], {
+                "sender": request.user,
+                "notification_type": "friend_accept",
+                "title": "Friend Request Accepted",
+                "message": f"{request.user.username} accepted your friend request",
+                "related_object_id": friendship.id,
+            })
 
         return Response(
             FriendshipSerializer(friendship, context={"request": request}).data
@@ -456,26 +484,34 @@ class FriendSearchView(ListAPIView):
 
     permission_classes = [IsAuthenticated]
     serializer_class = FriendListSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["username", "email", "first_name", "last_name"]
 
     def get_queryset(self):
-        user = self.request.user
+        query = self.request.query_params.get("search", "").strip()
+        if not query:
+            return User.objects.none()
+        return search_users(self.request.user, query, settings.FRIEND_SEARCH_LIMIT)
 
-        friendships = Friendship.objects.filter(
-            (models.Q(sender=user) | models.Q(receiver=user))
-            & models.Q(status="accepted")
-        )
 
-        friend_ids = []
-        for friendship in friendships:
-            if friendship.sender == user:
-                friend_ids.append(friendship.receiver.id)
-            else:
-                friend_ids.append(friendship.sender.id)
+class FriendSuggestionsView(APIView):
+    """View to list people the user may know, ranked by mutual connections"""
+
+    permission_classes = [IsAuthenticated]
 
-        exclude_ids = [user.id] + friend_ids
-        return User.objects.exclude(id__in=exclude_ids)
+    def get(self, request):
+        suggestions = get_suggestions(request.user.id)
+        users = User.objects.select_related("preferences").in_bulk(
+            [user_id for user_id, _, _ in suggestions]
+        )
+        serializer = FriendSuggestionSerializer(
+            [
+                {"user": users[user_id], "mutual_friends": mutual, "shared_trips": shared}
+                for user_id, mutual, shared in suggestions
+                if user_id in users
+            ],
+            many=True,
+            context={"request": request},
+        )
+        return Response(serializer.data)
 
 
 class FriendDeleteView(APIView):
@@ -509,14 +545,24 @@ class FriendDeleteView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class NotificationCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
+
+
 class NotificationListView(ListAPIView):
-    """View to list all notifications for the current user"""
+    """View to list notifications for the current user, newest first"""
 
     permission_classes = [IsAuthenticated]
     serializer_class = NotificationSerializer
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return Notification.objects.filter(recipient=self.request.user).select_related(
+            "sender", "sender__preferences"
+        )
 
 
 class NotificationCountView(APIView):
@@ -525,9 +571,10 @@ class NotificationCountView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        count = Notification.objects.filter(
-            recipient=request.user, is_read=False
-        ).count()
+        count = get_unread_count(
+            request.user.id,
+            lambda: Notification.objects.filter(recipient=request.user, is_read=False).count(),
+        )
         return Response({"count": count})
 
 
@@ -538,10 +585,12 @@ class NotificationMarkReadView(APIView):
 
     def put(self, request, pk=None):
         if pk:
+            # Conditional update so concurrent mark-read requests decrement the counter only once
+            marked = Notification.objects.filter(pk=pk, recipient=request.user, is_read=False).update(is_read=True)
+            if marked:
+                transaction.on_commit(lambda: adjust_unread_counts({request.user.id: -1}))
             try:
                 notification = Notification.objects.get(pk=pk, recipient=request.user)
-                notification.is_read = True
-                notification.save()
                 return Response(NotificationSerializer(notification).data)
             except Notification.DoesNotExist:
                 return Response(
@@ -549,7 +598,8 @@ class NotificationMarkReadView(APIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
         else:
-            Notification.objects.filter(recipient=request.user).update(is_read=True)
+            Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+            transaction.on_commit(lambda: set_unread_count(request.user.id, 0))
             return Response({"message": "All notifications marked as read"})
 
 